@@ -98,6 +98,36 @@ class CourseRecommendationAPI {
         }
     }
 
+    private function queryRecommendationServer($inputJson) {
+        $socket = getenv('RECOMMENDER_SOCKET');
+        $addr = getenv('RECOMMENDER_ADDR');
+        if ($socket) {
+            $target = 'unix://' . $socket;
+        } elseif ($addr) {
+            $target = 'tcp://' . $addr;
+        } else {
+            return null;
+        }
+
+        $fp = @stream_socket_client($target, $errno, $errstr, 1.0);
+        if (!$fp) {
+            return null;
+        }
+        stream_set_timeout($fp, 5);
+        fwrite($fp, json_encode(['student' => json_decode($inputJson, true)]) . "\n");
+        $line = fgets($fp);
+        fclose($fp);
+
+        if ($line === false) {
+            return null;
+        }
+        $decoded = json_decode($line, true);
+        if (!is_array($decoded) || !isset($decoded['recommendations'])) {
+            return null;
+        }
+        return $decoded;
+    }
+
     public function getCourses() {
         $stmt = $this->conn->query("SELECT * FROM courses ORDER BY department, course_code");
         return $stmt->fetchAll(PDO::FETCH_ASSOC);
@@ -117,6 +147,15 @@ public function getRecommendations($studentId) {
     ];
 
     $inputJson = json_encode($input);
+
+    $served = $this->queryRecommendationServer($inputJson);
+    if ($served !== null) {
+        return [
+            'success' => true,
+            'recommendations' => $served['recommendations'],
+            'catalog_version' => $served['catalog_version'] ?? null
+        ];
+    }
     
     $tmpDir = sys_get_temp_dir();
     if (!is_writable($tmpDir)) {
@@ -0,0 +1,292 @@
+"""Benchmarks for the recommendation engine on synthetic catalogs and cohorts.
+
+Run from the backend directory:
+
+    python3 benchmark_recommendations.py --sizes 1000,10000 --students 300 > bench.json
+    python3 benchmark_recommendations.py --baseline bench.json --tolerance 0.2
+
+Every measurement is emitted as one JSON document so runs can be diffed;
+with --baseline the process exits non-zero when a latency or throughput
+figure regresses by more than the tolerance.
+"""
+from __future__ import annotations
+import argparse
+import gc
+import importlib.util
+import json
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from recommendation_algorithm import (
+    LEARNING_STYLE_COMPATIBILITY,
+    CourseRecommendationEngine,
+    VectorizedRecommendationEngine,
+)
+
+HAVE_NUMPY = importlib.util.find_spec("numpy") is not None
+
+SCRIPT = Path(__file__).resolve().parent / "recommendation_algorithm.py"
+
+_BUILTIN = CourseRecommendationEngine._builtin_courses()
+CAREERS = sorted({career for course in _BUILTIN for career in course["career_relevance"]})
+STYLES = sorted(LEARNING_STYLE_COMPATIBILITY)
+DEPARTMENTS = sorted({course["department"] for course in _BUILTIN})
+MAJORS = sorted(CourseRecommendationEngine._load_major_requirements())
+
+
+def generate_catalog(size: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic courses using the built-in career, style and department vocabularies."""
+    rng = random.Random(seed)
+    courses = []
+    for i in range(size):
+        department = rng.choice(DEPARTMENTS)
+        prerequisites = []
+        if i >= 10 and rng.random() < 0.2:
+            prerequisites = ["SYN%05d" % rng.randrange(i)]
+        courses.append({
+            "id": i + 1,
+            "code": "SYN%05d" % i,
+            "name": "%s Topic %d" % (department, i),
+            "department": department,
+            "credits": rng.choice([1, 2, 3, 3, 3, 4]),
+            "difficulty": rng.randint(1, 5),
+            "prerequisites": prerequisites,
+            "career_relevance": rng.sample(CAREERS, rng.randint(2, 5)),
+            "learning_style": rng.sample(STYLES, 2),
+            "workload_hours": rng.randint(4, 14),
+        })
+    return courses
+
+
+def generate_major_requirements(catalog: List[Dict[str, Any]], seed: int = 0,
+                                per_major: int = 8) -> Dict[str, List[str]]:
+    """Synthetic requirements for the built-in majors, drawn from ``catalog`` codes.
+
+    Each major leans on two departments, like the built-in requirements do.
+    """
+    rng = random.Random(seed)
+    by_department: Dict[str, List[str]] = {}
+    for course in catalog:
+        by_department.setdefault(course["department"], []).append(course["code"])
+    codes = [course["code"] for course in catalog]
+    requirements = {}
+    for major in MAJORS:
+        pool = [code for department in rng.sample(DEPARTMENTS, 2) for code in by_department.get(department, [])]
+        pool = pool or codes
+        requirements[major] = sorted(rng.sample(pool, min(per_major, len(pool))))
+    return requirements
+
+
+def generate_students(count: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """Synthetic student profiles shaped like the ones api.php sends."""
+    rng = random.Random(seed)
+    return [
+        {
+            "student_id": "bench-%d" % i,
+            "gpa": round(rng.uniform(1.5, 4.0), 2),
+            "major": rng.choice(MAJORS),
+            "career_interests": rng.sample(CAREERS, rng.randint(0, 4)),
+            "learning_style": rng.choice(STYLES),
+            "study_hours": rng.choice([5, 8, 10, 12, 15, 20]),
+        }
+        for i in range(count)
+    ]
+
+
+def _percentiles(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    return {
+        "p50_ms": round(pick(0.50) * 1000, 3),
+        "p90_ms": round(pick(0.90) * 1000, 3),
+        "p99_ms": round(pick(0.99) * 1000, 3),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 3),
+    }
+
+
+def _startup(engine_class, catalog_path: Path, majors: Dict[str, List[str]]) -> Dict[str, Any]:
+    def build():
+        return engine_class(catalog_path=catalog_path, snapshot_path=catalog_path.with_suffix(".snapshot"),
+                            major_requirements=majors)
+
+    # tracemalloc slows allocation several times over, so time and trace separate builds
+    gc.collect()
+    started = time.perf_counter()
+    engine = build()
+    elapsed = time.perf_counter() - started
+
+    gc.collect()
+    tracemalloc.start()
+    build()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {"engine": engine, "startup_ms": round(elapsed * 1000, 3), "startup_peak_mb": round(peak / 1e6, 2)}
+
+
+def bench_engine(engine_class, catalog_path: Path, majors: Dict[str, List[str]],
+                 students: List[Dict[str, Any]], top_n: int) -> Dict[str, Any]:
+    started = _startup(engine_class, catalog_path, majors)
+    engine = started.pop("engine")
+
+    latencies = []
+    for student in students:
+        t = time.perf_counter()
+        engine.generate_recommendations(student, top_n)
+        latencies.append(time.perf_counter() - t)
+
+    t = time.perf_counter()
+    engine.generate_recommendations_batch(students, top_n)
+    batch_elapsed = time.perf_counter() - t
+
+    gc.collect()
+    tracemalloc.start()
+    engine.generate_recommendations_batch(students[:50], top_n)
+    _, scoring_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    result = dict(started)
+    result["single"] = _percentiles(latencies)
+    result["single"]["throughput_per_s"] = round(len(latencies) / sum(latencies), 1)
+    result["batch"] = {
+        "students": len(students),
+        "elapsed_ms": round(batch_elapsed * 1000, 3),
+        "throughput_per_s": round(len(students) / batch_elapsed, 1),
+    }
+    result["scoring_peak_mb"] = round(scoring_peak / 1e6, 2)
+    return result
+
+
+def bench_cli(catalog_path: Path, majors_path: Path, students: List[Dict[str, Any]], runs: int,
+              top_n: int) -> Dict[str, Any]:
+    workdir = catalog_path.parent
+    student_file = workdir / "student.json"
+    student_file.write_text(json.dumps(students[0]), encoding="utf-8")
+    common = ["--catalog", str(catalog_path), "--majors", str(majors_path), "--top-n", str(top_n)]
+
+    latencies = []
+    for _ in range(runs):
+        t = time.perf_counter()
+        subprocess.run([sys.executable, str(SCRIPT), str(student_file)] + common,
+                       check=True, stdout=subprocess.DEVNULL)
+        latencies.append(time.perf_counter() - t)
+
+    batch_file = workdir / "students.jsonl"
+    batch_file.write_text("".join(json.dumps(s) + "\n" for s in students), encoding="utf-8")
+    t = time.perf_counter()
+    subprocess.run([sys.executable, str(SCRIPT), "--batch", str(batch_file)] + common,
+                   check=True, stdout=subprocess.DEVNULL)
+    batch_elapsed = time.perf_counter() - t
+
+    result = {"single_process": _percentiles(latencies)}
+    result["batch_process"] = {
+        "students": len(students),
+        "elapsed_ms": round(batch_elapsed * 1000, 3),
+        "throughput_per_s": round(len(students) / batch_elapsed, 1),
+    }
+    return result
+
+
+def run(sizes: List[int], student_count: int, top_n: int = 15, seed: int = 0,
+        cli_runs: int = 5, include_cli: bool = True) -> Dict[str, Any]:
+    students = generate_students(student_count, seed)
+    report: Dict[str, Any] = {
+        "python": sys.version.split()[0],
+        "numpy": HAVE_NUMPY,
+        "students": student_count,
+        "top_n": top_n,
+        "seed": seed,
+        "catalogs": {},
+    }
+    engines = [("python", CourseRecommendationEngine)]
+    if HAVE_NUMPY:
+        engines.append(("vectorized", VectorizedRecommendationEngine))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in sizes:
+            catalog = generate_catalog(size, seed)
+            majors = generate_major_requirements(catalog, seed)
+            catalog_path = Path(tmp) / ("catalog-%d.json" % size)
+            catalog_path.write_text(json.dumps(catalog), encoding="utf-8")
+            majors_path = Path(tmp) / ("majors-%d.json" % size)
+            majors_path.write_text(json.dumps(majors), encoding="utf-8")
+            entry = {name: bench_engine(engine_class, catalog_path, majors, students, top_n)
+                     for name, engine_class in engines}
+            if include_cli:
+                entry["cli"] = bench_cli(catalog_path, majors_path, students, cli_runs, top_n)
+            report["catalogs"][str(size)] = entry
+    return report
+
+
+def _flatten(report: Dict[str, Any], prefix: str = "") -> Dict[str, float]:
+    flat = {}
+    for key, value in report.items():
+        name = prefix + key
+        if isinstance(value, dict):
+            flat.update(_flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Metrics that got worse than ``baseline`` by more than ``tolerance`` (a fraction)."""
+    now, before = _flatten(current["catalogs"]), _flatten(baseline.get("catalogs", {}))
+    regressions = []
+    for name, old in before.items():
+        new = now.get(name)
+        if new is None or old <= 0:
+            continue
+        if name.endswith("throughput_per_s"):
+            worse = new < old * (1 - tolerance)
+        elif name.endswith("_ms") or name.endswith("_mb"):
+            worse = new > old * (1 + tolerance)
+        else:
+            continue
+        if worse:
+            regressions.append("%s: %s -> %s" % (name, old, new))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the recommendation engine")
+    parser.add_argument("--sizes", default="1000,10000", help="comma-separated catalog sizes")
+    parser.add_argument("--students", type=int, default=200, help="profiles scored per catalog")
+    parser.add_argument("--top-n", type=int, default=15)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cli-runs", type=int, default=5, help="single-profile CLI process spawns to time")
+    parser.add_argument("--skip-cli", action="store_true", help="do not benchmark the CLI")
+    parser.add_argument("--output", help="write the JSON report here instead of stdout")
+    parser.add_argument("--baseline", help="previous JSON report to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed regression fraction")
+    args = parser.parse_args(argv)
+
+    sizes = [int(size) for size in args.sizes.split(",") if size]
+    report = run(sizes, args.students, args.top_n, args.seed, args.cli_runs, not args.skip_cli)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            regressions = find_regressions(report, json.load(f), args.tolerance)
+        report["regressions"] = regressions
+        status = 1 if regressions else 0
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        Path(args.output).write_text(text + "\n", encoding="utf-8")
+    else:
+        print(text)
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,46 +1,1243 @@
 from __future__ import annotations
+import argparse
+import atexit
+import hashlib
+import heapq
 import json
 import logging
+import logging.handlers
+import marshal
+import mmap
+import os
+import queue
+import re
+import socketserver
+import struct
 import sys
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from types import MappingProxyType
+from typing import (TYPE_CHECKING, Any, Callable, Dict, FrozenSet, Iterable, Iterator, List, Mapping, NamedTuple,
+                    Optional, Tuple)
 import math
 
+if TYPE_CHECKING:  # imported where used; only the annotations need them here
+    import asyncio
+    import concurrent.futures
+
+# numpy is optional and slow to import; only VectorizedRecommendationEngine
+# needs it, so it is loaded by _require_numpy on first use.
+np = None
+
+try:
+    import orjson
+except ImportError:  # optional fast backend for ResultSerializer
+    orjson = None
+
+DEFAULT_CATALOG_PATH = Path(__file__).resolve().parent / "courses.json"
+DEFAULT_SNAPSHOT_PATH = Path(__file__).resolve().parent / "catalog.snapshot"
+
 LOG_DIR = Path(__file__).resolve().parent / "logs"
-LOG_DIR.mkdir(parents=True, exist_ok=True)
 LOG_FILE = LOG_DIR / "recommendation.log"
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s %(levelname)s %(message)s",
-    handlers=[logging.FileHandler(LOG_FILE, encoding="utf-8")],
-)
+LOG_FORMAT = "%(asctime)s %(levelname)s %(message)s"
 logger = logging.getLogger(__name__)
+_log_listener: Optional[logging.handlers.QueueListener] = None
+_log_handler: Optional[logging.handlers.QueueHandler] = None
+_log_file: Optional[Path] = None  # as passed to configure_logging, before any per-process suffix
 
-class CourseRecommendationEngine:
-    def __init__(self, weights: Optional[Dict[str, float]] = None) -> None:
-        self.weights = weights or {
-            "career": 0.35,
-            "major": 0.25,
-            "difficulty": 0.15,
-            "workload": 0.15,
-            "learning": 0.10,
+
+def configure_logging(log_file: Optional[Path] = None, per_process: bool = False,
+                      level: int = logging.INFO) -> logging.handlers.QueueListener:
+    """Send root log records through a queue to a file written by a background thread.
+
+    Request threads only enqueue records; the ``QueueListener`` thread does
+    the formatting and disk writes.  With ``per_process`` each worker writes
+    ``recommendation.<pid>.log`` so workers never contend on one file.
+    Importing the module configures nothing; entry points call this once.
+    """
+    global _log_listener, _log_handler, _log_file
+    if _log_listener is not None:
+        return _log_listener
+
+    path = _log_file = Path(log_file) if log_file else LOG_FILE
+    if per_process:
+        path = path.with_name("%s.%d%s" % (path.stem, os.getpid(), path.suffix))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    file_handler = logging.FileHandler(path, encoding="utf-8", delay=True)
+    file_handler.setFormatter(logging.Formatter(LOG_FORMAT))
+
+    records: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    root = logging.getLogger()
+    _log_handler = logging.handlers.QueueHandler(records)
+    root.addHandler(_log_handler)
+    root.setLevel(level)
+    _log_listener = logging.handlers.QueueListener(records, file_handler, respect_handler_level=True)
+    _log_listener.start()
+    atexit.register(stop_logging)
+    return _log_listener
+
+
+def stop_logging() -> None:
+    """Detach the queue handler, then flush queued records and stop the listener started by ``configure_logging``."""
+    global _log_listener, _log_handler
+    if _log_handler is not None:
+        logging.getLogger().removeHandler(_log_handler)
+        _log_handler = None
+    if _log_listener is not None:
+        _log_listener.stop()
+        _log_listener = None
+        atexit.unregister(stop_logging)
+
+
+DEFAULT_WEIGHTS: Dict[str, float] = {
+    "career": 0.35,
+    "major": 0.25,
+    "difficulty": 0.15,
+    "workload": 0.15,
+    "learning": 0.10,
+}
+
+# Confidence multiplier for courses whose prerequisites are not yet met
+# under the "downrank" prerequisite policy.
+PREREQUISITE_PENALTY = 0.5
+
+# Result detail levels, cheapest first; see generate_recommendations.
+DETAIL_LEVELS = ("ids-only", "scores", "full")
+
+LEARNING_STYLE_COMPATIBILITY: Dict[str, List[str]] = {
+    "Visual": ["Hands-on", "Analytical"],
+    "Hands-on": ["Visual", "Analytical"],
+    "Analytical": ["Visual", "Hands-on", "Reading"],
+    "Reading": ["Writing", "Discussion", "Analytical"],
+    "Writing": ["Reading", "Discussion"],
+    "Discussion": ["Reading", "Writing"],
+}
+
+
+def _check_detail(detail: str) -> None:
+    if detail not in DETAIL_LEVELS:
+        raise ValueError("detail must be one of %s" % ", ".join(DETAIL_LEVELS))
+
+
+def _brief_result(course: "CourseRecord", confidence: float, detail: str) -> Dict[str, Any]:
+    """Result dict for the ``ids-only`` and ``scores`` detail levels."""
+    if detail == "ids-only":
+        return {"course_id": course.id, "course_code": course.code}
+    return {"course_id": course.id, "course_code": course.code, "confidence_score": round(confidence, 2)}
+
+
+def _require_numpy():
+    """Import numpy into the module global ``np``; raises ImportError when it is missing."""
+    global np
+    if np is None:
+        import numpy
+        np = numpy
+    return np
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if type(value) is str else value
+
+
+_FROZENSET_POOL: "weakref.WeakValueDictionary[FrozenSet[str], FrozenSet[str]]" = weakref.WeakValueDictionary()
+
+
+def _string_set(value: Any, field: str) -> FrozenSet[str]:
+    if value is None:
+        return frozenset()
+    if isinstance(value, str) or not isinstance(value, (list, tuple, set, frozenset)):
+        raise ValueError("%s must be a list of strings" % field)
+    if not all(isinstance(item, str) for item in value):
+        raise ValueError("%s must be a list of strings" % field)
+    items = frozenset(_intern(item) for item in value)
+    # Courses share a handful of distinct style/career sets; keep one copy of each.
+    return _FROZENSET_POOL.setdefault(items, items)
+
+
+class CourseRecord:
+    """Compact, type-checked catalog course.
+
+    Loaders convert raw course dicts into these once. ``get`` and ``[]`` keep
+    read access working for code written against the dict layout.
+    """
+
+    __slots__ = ("id", "code", "name", "department", "credits", "difficulty",
+                 "prerequisites", "career_relevance", "learning_style", "workload_hours")
+
+    def __init__(self, id: Any, code: str, name: Optional[str], department: Optional[str],
+                 credits: Optional[int], difficulty: int, prerequisites: Tuple[str, ...],
+                 career_relevance: FrozenSet[str], learning_style: FrozenSet[str],
+                 workload_hours: float) -> None:
+        self.id = id
+        self.code = code
+        self.name = name
+        self.department = department
+        self.credits = credits
+        self.difficulty = difficulty
+        self.prerequisites = prerequisites
+        self.career_relevance = career_relevance
+        self.learning_style = learning_style
+        self.workload_hours = workload_hours
+
+    @classmethod
+    def from_dict(cls, data: Mapping[str, Any]) -> "CourseRecord":
+        """Validate and convert one raw course; raises ValueError when it is malformed."""
+        if not isinstance(data, Mapping):
+            raise ValueError("course must be a JSON object")
+
+        code = data.get("code", "")
+        if not isinstance(code, str):
+            raise ValueError("code must be a string")
+        for field in ("name", "department"):
+            if data.get(field) is not None and not isinstance(data.get(field), str):
+                raise ValueError("%s must be a string" % field)
+
+        try:
+            difficulty = int(data.get("difficulty", 3))
+            workload_hours = float(data.get("workload_hours", 8))
+            credits = data.get("credits")
+            credits = int(credits) if credits is not None else None
+        except (TypeError, ValueError) as e:
+            raise ValueError("invalid numeric field: %s" % e)
+
+        prerequisites = data.get("prerequisites") or ()
+        if not isinstance(prerequisites, (list, tuple)) or not all(isinstance(p, str) for p in prerequisites):
+            raise ValueError("prerequisites must be a list of course codes")
+
+        return cls(
+            id=data.get("id"),
+            code=_intern(code),
+            name=data.get("name"),
+            department=_intern(data.get("department")),
+            credits=credits,
+            difficulty=difficulty,
+            prerequisites=tuple(_intern(p) for p in prerequisites),
+            career_relevance=_string_set(data.get("career_relevance"), "career_relevance"),
+            learning_style=_string_set(data.get("learning_style"), "learning_style"),
+            workload_hours=workload_hours,
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        if key in CourseRecord.__slots__:
+            return getattr(self, key)
+        return default
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in CourseRecord.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = {key: getattr(self, key) for key in CourseRecord.__slots__}
+        data["prerequisites"] = list(self.prerequisites)
+        data["career_relevance"] = sorted(self.career_relevance)
+        data["learning_style"] = sorted(self.learning_style)
+        return data
+
+    def __repr__(self) -> str:
+        return "CourseRecord(code=%r, name=%r)" % (self.code, self.name)
+
+
+_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_NUMBER_TAIL = re.compile(r"[0-9.eE+-]*")
+# a literal or \uXXXX escape cut by the buffer edge fails at most this far before it
+_TRUNCATION_WINDOW = 6
+
+
+def _truncated(error: json.JSONDecodeError, buf: str) -> bool:
+    """Whether more input could cure ``error``, i.e. it comes from the end of ``buf``."""
+    return error.pos >= len(buf) - _TRUNCATION_WINDOW or error.msg.startswith("Unterminated string")
+
+
+def _iter_json_array(f, chunk_size: int = 1 << 16) -> Iterator[Any]:
+    """Yield the elements of a top-level JSON array one at a time.
+
+    Only the current element and one read chunk are held in memory, so the
+    whole document is never materialized.  Raises ValueError on syntax errors
+    as soon as they are found, rather than after buffering the rest of the file.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    eof = False
+
+    def fill() -> None:
+        nonlocal buf, pos, eof
+        data = f.read(chunk_size)
+        if not data:
+            eof = True
+        buf = buf[pos:] + data
+        pos = 0
+
+    def skip_whitespace() -> None:
+        nonlocal pos
+        while True:
+            pos = _WHITESPACE.match(buf, pos).end()
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    skip_whitespace()
+    if buf[pos:pos + 1] != "[":
+        raise ValueError("catalog must be a JSON array")
+    pos += 1
+    skip_whitespace()
+    if buf[pos:pos + 1] == "]":
+        return
+
+    while True:
+        skip_whitespace()
+        try:
+            element, end = decoder.raw_decode(buf, pos)
+            if isinstance(element, (int, float)) and not isinstance(element, bool):
+                # "0." may be the start of "0.5": wait for a character that cannot extend it
+                complete = _NUMBER_TAIL.match(buf, end).end() < len(buf) or eof
+            else:
+                complete = end < len(buf) or eof
+        except json.JSONDecodeError as e:
+            if eof or not _truncated(e, buf):
+                raise
+            complete = False
+        if not complete:
+            fill()
+            continue
+        pos = end
+        yield element
+
+        skip_whitespace()
+        separator = buf[pos:pos + 1]
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("expected ',' or ']' in catalog array")
+
+
+def stream_course_records(path: Path, errors: Optional[List[Tuple[int, str]]] = None) -> Iterator[CourseRecord]:
+    """Stream CourseRecords from a JSON array or JSON Lines catalog file.
+
+    Rows are validated and compacted as they are parsed.  Malformed rows are
+    skipped and reported as ``(row_number, message)`` in ``errors``; an
+    unparseable JSON array still raises, since the rest cannot be located.
+    """
+    if errors is None:
+        errors = []
+    with open(path, "r", encoding="utf-8") as f:
+        head = f.read(1)
+        while head and head.isspace():
+            head = f.read(1)
+        f.seek(0)
+
+        if head == "[":
+            rows: Iterable[Tuple[int, Any]] = enumerate(_iter_json_array(f), 1)
+        else:
+            rows = _iter_json_lines(f, errors)
+
+        for row, data in rows:
+            try:
+                yield CourseRecord.from_dict(data)
+            except ValueError as e:
+                errors.append((row, str(e)))
+
+
+def _iter_json_lines(f, errors: List[Tuple[int, str]]) -> Iterator[Tuple[int, Any]]:
+    for row, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield row, json.loads(line)
+        except ValueError as e:
+            errors.append((row, "invalid JSON: %s" % e))
+
+
+class PrerequisiteGraph:
+    """Prerequisite DAG compiled from course codes, with bitset closures.
+
+    Only codes that are some course's prerequisite get a bit, in topological
+    order, so masks stay as small as the set of prerequisite codes.
+    ``direct[i]`` is the mask of course i's own prerequisites and
+    ``closure[code]`` the mask of all its transitive prerequisites.  Codes on
+    or behind a prerequisite cycle are listed in ``cyclic``.
+    """
+
+    __slots__ = ("bits", "order", "cyclic", "direct", "closure")
+
+    def __init__(self, courses: Tuple[CourseRecord, ...]) -> None:
+        requires: Dict[str, set] = {}
+        for c in courses:
+            requires.setdefault(c.code, set()).update(c.prerequisites)
+        for prereqs in list(requires.values()):
+            for code in prereqs:
+                requires.setdefault(code, set())
+
+        # Kahn's algorithm: a code is ready once all of its prerequisites are placed.
+        dependents: Dict[str, List[str]] = {code: [] for code in requires}
+        pending = {code: len(prereqs) for code, prereqs in requires.items()}
+        for code, prereqs in requires.items():
+            for prereq in prereqs:
+                dependents[prereq].append(code)
+        ready = sorted(code for code, count in pending.items() if count == 0)
+        order: List[str] = []
+        while ready:
+            code = ready.pop()
+            order.append(code)
+            for dependent in dependents[code]:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+        cyclic = frozenset(code for code, count in pending.items() if count > 0)
+        if cyclic:
+            logger.warning("Prerequisite cycle involving %d courses: %s", len(cyclic), ", ".join(sorted(cyclic)[:10]))
+
+        needed = set()
+        for prereqs in requires.values():
+            needed.update(prereqs)
+        bits: Dict[str, int] = {}
+        for code in order + sorted(cyclic):
+            if code in needed:
+                bits[code] = 1 << len(bits)
+
+        closure: Dict[str, int] = {}
+        for code in order:
+            mask = 0
+            for prereq in requires[code]:
+                mask |= bits[prereq] | closure[prereq]
+            closure[code] = mask
+        # Cyclic codes have no topological order; iterate their closures to a fixed point.
+        for code in cyclic:
+            closure[code] = 0
+        changed = bool(cyclic)
+        while changed:
+            changed = False
+            for code in cyclic:
+                mask = closure[code]
+                for prereq in requires[code]:
+                    mask |= bits[prereq] | closure[prereq]
+                if mask != closure[code]:
+                    closure[code] = mask
+                    changed = True
+
+        direct = []
+        for c in courses:
+            mask = 0
+            for prereq in c.prerequisites:
+                mask |= bits[prereq]
+            direct.append(mask)
+
+        self.bits: Mapping[str, int] = MappingProxyType(bits)
+        self.order: Tuple[str, ...] = tuple(order)
+        self.cyclic: FrozenSet[str] = cyclic
+        self.direct: Tuple[int, ...] = tuple(direct)
+        self.closure: Mapping[str, int] = MappingProxyType(closure)
+
+    def completed_mask(self, completed: Iterable[str]) -> int:
+        """Bitset of prerequisites satisfied by ``completed``, including those implied transitively."""
+        mask = 0
+        bits, closure = self.bits, self.closure
+        for code in completed:
+            mask |= bits.get(code, 0) | closure.get(code, 0)
+        return mask
+
+    def is_eligible(self, index: int, completed_mask: int) -> bool:
+        return not (self.direct[index] & ~completed_mask)
+
+
+class StudentProfile(NamedTuple):
+    """Normalized student inputs; ``completed_courses`` is None when the caller did not send any."""
+    gpa: float
+    major: str
+    career_interests: List[str]
+    learning_style: str
+    study_hours: float
+    completed_courses: Optional[FrozenSet[str]] = None
+    student_id: Any = None
+
+
+class CompiledCatalog(NamedTuple):
+    """Immutable, precompiled catalog the engine scores against.
+
+    ``learning_scores`` maps each known student learning style to the learning
+    factor of every course, in ``courses`` order.  ``version`` is a short hash
+    of the catalog contents.
+    """
+    courses: Tuple[CourseRecord, ...]
+    major_requirements: Mapping[str, FrozenSet[str]]
+    learning_scores: Mapping[str, Tuple[float, ...]]
+    version: str
+    prerequisites: PrerequisiteGraph
+
+
+SNAPSHOT_MAGIC = b"SCCATSNP"
+# Bump whenever the snapshot layout or the code compiled into it (_compile_catalog,
+# _match_learning_style) changes; the source hash only covers data.
+SNAPSHOT_FORMAT = 1
+# magic, format, python major/minor, marshal version, sha256 of the sources, payload length
+_SNAPSHOT_HEADER = struct.Struct("<8sHBBH32sQ")
+
+
+def write_snapshot(path: Path, catalog: CompiledCatalog, source_hash: bytes) -> None:
+    """Write ``catalog`` as a binary snapshot, atomically replacing ``path``.
+
+    The payload is ``marshal`` data, which is tied to the Python version; the
+    header records it so other interpreters treat the snapshot as stale.
+    """
+    payload = marshal.dumps({
+        "version": catalog.version,
+        "courses": [tuple(getattr(c, key) for key in CourseRecord.__slots__) for c in catalog.courses],
+        "major_requirements": dict(catalog.major_requirements),
+        "learning_scores": dict(catalog.learning_scores),
+    })
+    header = _SNAPSHOT_HEADER.pack(SNAPSHOT_MAGIC, SNAPSHOT_FORMAT, sys.version_info[0], sys.version_info[1],
+                                   marshal.version, source_hash, len(payload))
+    tmp = Path(str(path) + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(payload)
+    os.replace(tmp, path)
+
+
+def load_snapshot(path: Path, source_hash: bytes) -> Optional[CompiledCatalog]:
+    """Memory-map a snapshot and rebuild the CompiledCatalog, or None if missing, stale or corrupt."""
+    try:
+        with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if len(mm) < _SNAPSHOT_HEADER.size:
+                return None
+            magic, fmt, major, minor, marshal_version, stored_hash, length = _SNAPSHOT_HEADER.unpack_from(mm)
+            if (magic != SNAPSHOT_MAGIC or fmt != SNAPSHOT_FORMAT
+                    or (major, minor) != tuple(sys.version_info[:2])
+                    or marshal_version != marshal.version or stored_hash != source_hash
+                    or len(mm) != _SNAPSHOT_HEADER.size + length):
+                return None
+            view = memoryview(mm)[_SNAPSHOT_HEADER.size:]
+            try:
+                data = marshal.loads(view)
+            finally:
+                view.release()
+    except (OSError, ValueError, EOFError, TypeError):
+        return None
+
+    try:
+        courses = tuple(CourseRecord(*fields) for fields in data["courses"])
+        return CompiledCatalog(
+            courses=courses,
+            major_requirements=MappingProxyType(data["major_requirements"]),
+            learning_scores=MappingProxyType(data["learning_scores"]),
+            version=data["version"],
+            prerequisites=PrerequisiteGraph(courses),
+        )
+    except (KeyError, TypeError):
+        return None
+
+
+class MetricsRegistry:
+    """Per-stage timers and counters for the recommendation hot path.
+
+    Engines only record anything when a registry is attached as
+    ``engine.metrics``; with none attached each stage costs one ``is None``
+    check.  Timers are (count, total seconds, max seconds) per stage, from
+    ``STAGES``.  Hooks added with ``add_hook`` are called as
+    ``hook(kind, name, value)`` with kind ``"timer"`` or ``"counter"`` for
+    every observation, to forward into statsd, OpenTelemetry and the like.
+    """
+
+    STAGES = ("normalize", "score", "select", "reasoning", "serialize")
+
+    def __init__(self, prefix: str = "smartcourse") -> None:
+        self.prefix = prefix
+        self._timers: Dict[str, List[float]] = {}
+        self._counters: Dict[str, float] = {}
+        self._hooks: List[Callable[[str, str, float], None]] = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, hook: Callable[[str, str, float], None]) -> None:
+        self._hooks.append(hook)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            timer = self._timers.get(stage)
+            if timer is None:
+                self._timers[stage] = [1, seconds, seconds]
+            else:
+                timer[0] += 1
+                timer[1] += seconds
+                if seconds > timer[2]:
+                    timer[2] = seconds
+        for hook in self._hooks:
+            hook("timer", stage, seconds)
+
+    def count(self, name: str, value: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+        for hook in self._hooks:
+            hook("counter", name, value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._timers.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "timers": {
+                    stage: {"count": count, "total_seconds": total, "max_seconds": peak}
+                    for stage, (count, total, peak) in sorted(self._timers.items())
+                },
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def to_json(self) -> str:
+        return json.dumps(self.snapshot())
+
+    def to_prometheus(self) -> str:
+        """Render the registry in the Prometheus text exposition format."""
+        data = self.snapshot()
+        name = self.prefix + "_stage_seconds"
+        lines = ["# HELP %s Time spent per recommendation stage." % name, "# TYPE %s summary" % name]
+        for stage, timer in data["timers"].items():
+            lines.append('%s_count{stage="%s"} %d' % (name, stage, timer["count"]))
+            lines.append('%s_sum{stage="%s"} %r' % (name, stage, timer["total_seconds"]))
+        lines.append("# TYPE %s_max gauge" % name)
+        for stage, timer in data["timers"].items():
+            lines.append('%s_max{stage="%s"} %r' % (name, stage, timer["max_seconds"]))
+        for counter, value in data["counters"].items():
+            metric = "%s_%s_total" % (self.prefix, counter)
+            lines.append("# TYPE %s counter" % metric)
+            lines.append("%s %r" % (metric, value))
+        return "\n".join(lines) + "\n"
+
+
+class ResultSerializer:
+    """Encodes engine output as JSON text, optionally trimmed to selected result fields.
+
+    ``backend`` is ``"orjson"`` or ``"json"``; ``"auto"`` picks orjson when it
+    is installed.  orjson writes compact JSON that decodes to the same values
+    as ``json.dumps``; payloads it refuses (e.g. integers wider than 64 bits)
+    fall back to ``json``.  ``fields`` keeps only the named keys of each
+    recommendation and ``omit`` drops keys, for bare recommendation lists and
+    for dicts carrying a ``"recommendations"`` list alike.
+    """
+
+    def __init__(self, fields: Optional[Iterable[str]] = None, omit: Iterable[str] = (),
+                 backend: str = "auto") -> None:
+        if backend == "auto":
+            backend = "orjson" if orjson is not None else "json"
+        if backend not in ("orjson", "json"):
+            raise ValueError("backend must be 'auto', 'orjson' or 'json'")
+        if backend == "orjson" and orjson is None:
+            raise ImportError("the orjson backend requires orjson")
+        self.backend = backend
+        self.fields = tuple(fields) if fields else None
+        self.omit = frozenset(omit)
+
+    def select(self, payload: Any) -> Any:
+        if self.fields is None and not self.omit:
+            return payload
+        if isinstance(payload, list):
+            return [self._project(r) for r in payload]
+        if isinstance(payload, dict) and isinstance(payload.get("recommendations"), list):
+            return dict(payload, recommendations=[self._project(r) for r in payload["recommendations"]])
+        return payload
+
+    def _project(self, rec: Any) -> Any:
+        if not isinstance(rec, dict):
+            return rec
+        if self.fields is not None:
+            rec = {key: rec[key] for key in self.fields if key in rec}
+        if self.omit:
+            rec = {key: value for key, value in rec.items() if key not in self.omit}
+        return rec
+
+    def encode(self, payload: Any) -> str:
+        if self.backend == "orjson":
+            try:
+                return orjson.dumps(payload).decode("utf-8")
+            except TypeError:  # orjson.JSONEncodeError
+                pass
+        return json.dumps(payload)
+
+    def dumps(self, payload: Any, metrics: Optional[MetricsRegistry] = None) -> str:
+        """Select fields and encode; the time is reported as the ``serialize`` stage when metrics are on."""
+        if metrics is None:
+            return self.encode(self.select(payload))
+        started = time.perf_counter()
+        text = self.encode(self.select(payload))
+        metrics.observe("serialize", time.perf_counter() - started)
+        return text
+
+    def write_lines(self, records: Iterable[Any], stream, metrics: Optional[MetricsRegistry] = None) -> None:
+        """Write each record as one JSON line as soon as it is produced."""
+        for record in records:
+            stream.write(self.dumps(record, metrics) + "\n")
+
+
+class RecommendationCache:
+    """Thread-safe LRU cache with optional TTL for recommendation lists.
+
+    Keys come from ``CourseRecommendationEngine._cache_key``: the normalized
+    profile, ``top_n``, the detail level, the catalog version and the weights.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = 300.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Any, Tuple[float, List[Dict[str, Any]]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _copy(recs: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [{k: dict(v) if isinstance(v, dict) else v for k, v in r.items()} for r in recs]
+
+    def get(self, key: Any) -> Optional[List[Dict[str, Any]]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            stored_at, recs = entry
+            if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+                del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return self._copy(recs)
+
+    def put(self, key: Any, recs: List[Dict[str, Any]]) -> None:
+        recs = self._copy(recs)
+        with self._lock:
+            self._entries[key] = (time.monotonic(), recs)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+
+REASONING_PHRASES: Dict[str, str] = {
+    "major": "Required for {major} major",
+    "career_strong": "Strong alignment with career interests",
+    "career_relevant": "Relevant to career goals",
+    "learning": "Matches learning style perfectly",
+    "workload_fits": "Workload fits study schedule",
+    "workload_heavy": "Challenging workload",
+    "difficulty_match": "Good match for academic level",
+    "difficulty_hard": "May require extra effort",
+    "foundational": "Great foundational course",
+    "default": "General education requirement",
+}
+
+
+class ReasoningTemplates:
+    """Reasoning strings memoized by factor bucket.
+
+    A reasoning line depends only on the major (when the course is required),
+    which threshold band each factor falls in and whether the course is
+    foundational, so each distinct key is rendered and interned once.
+    Keys with a major are bounded by the catalog's majors.  For another
+    locale pass translated ``phrases`` (same keys as ``REASONING_PHRASES``)
+    and ``separator``, or override ``render_key``.
+    """
+
+    def __init__(self, phrases: Optional[Mapping[str, str]] = None, separator: str = " • ") -> None:
+        self.phrases = dict(REASONING_PHRASES, **(phrases or {}))
+        self.separator = separator
+        self._memo: Dict[Tuple, str] = {}
+
+    @staticmethod
+    def key(major: str, is_major_req: bool, career_score: float, learning_score: float,
+            workload_score: float, difficulty_score: float, course_difficulty: Any) -> Tuple:
+        return (
+            major if is_major_req else None,
+            2 if career_score > 0.7 else 1 if career_score > 0.4 else 0,
+            learning_score > 0.8,
+            2 if workload_score > 0.8 else 0 if workload_score < 0.5 else 1,
+            2 if difficulty_score > 0.8 else 0 if difficulty_score < 0.6 else 1,
+            course_difficulty <= 2,
+        )
+
+    def render(self, *args: Any) -> str:
+        """Reasoning for ``key(*args)``, built on first use."""
+        key = self.key(*args)
+        text = self._memo.get(key)
+        if text is None:
+            text = self._memo[key] = sys.intern(self.render_key(key))
+        return text
+
+    def render_key(self, key: Tuple) -> str:
+        major, career, learning, workload, difficulty, foundational = key
+        phrases = self.phrases
+        reasons = []
+        if major is not None:
+            reasons.append(phrases["major"].format(major=major))
+        if career:
+            reasons.append(phrases["career_strong"] if career == 2 else phrases["career_relevant"])
+        if learning:
+            reasons.append(phrases["learning"])
+        if workload != 1:
+            reasons.append(phrases["workload_fits"] if workload == 2 else phrases["workload_heavy"])
+        if difficulty != 1:
+            reasons.append(phrases["difficulty_match"] if difficulty == 2 else phrases["difficulty_hard"])
+        if foundational:
+            reasons.append(phrases["foundational"])
+        return self.separator.join(reasons) if reasons else phrases["default"]
+
+
+ENROLLMENTS_LOG = LOG_DIR / "enrollments.log"
+FEEDBACK_LOG = LOG_DIR / "feedback.log"
+
+
+class DiversityReranker:
+    """Post-processing stage that stops one department from filling the top N.
+
+    The engine ranks ``pool_factor * top_n`` courses exactly as usual and hands
+    that pool (best first) to ``select``.  ``"mmr"`` is greedy maximal
+    marginal relevance: each pick maximizes
+    ``trade_off * relevance - (1 - trade_off) * similarity`` where relevance
+    is confidence relative to the pool's best and similarity is the highest
+    against any course already picked (1.0 within a department, otherwise the
+    Jaccard overlap of career relevance).  That maximum is updated with the
+    newest pick only, so a pool of N costs O(N * top_n).  ``trade_off=1``
+    keeps the plain ranking.  ``"quota"`` keeps rank order but takes at most
+    ``department_quota`` courses per department, topping up from the
+    skipped ones when the pool runs short.
+    """
+
+    def __init__(self, strategy: str = "mmr", trade_off: float = 0.7, department_quota: int = 2,
+                 pool_factor: int = 4) -> None:
+        if strategy not in ("mmr", "quota"):
+            raise ValueError("strategy must be 'mmr' or 'quota'")
+        self.strategy = strategy
+        self.trade_off = trade_off
+        self.department_quota = department_quota
+        self.pool_factor = pool_factor
+
+    def key(self) -> Tuple:
+        """Configuration for result cache keys."""
+        return (self.strategy, self.trade_off, self.department_quota, self.pool_factor)
+
+    def pool_size(self, keep: int) -> int:
+        return max(keep, keep * self.pool_factor)
+
+    def select(self, relevance: List[float], courses: List[CourseRecord], keep: int) -> List[int]:
+        """Positions into the pool, in final order, of the ``keep`` courses to return."""
+        if self.strategy == "quota":
+            return self._select_quota(courses, keep)
+        n = len(relevance)
+        top = max(relevance, default=0.0)
+        scale = top if top > 0 else 1.0
+        rel = [r / scale for r in relevance]
+        lam = self.trade_off
+        closest = [0.0] * n
+        remaining = list(range(n))
+        picked: List[int] = []
+        while remaining and len(picked) < keep:
+            # earlier (better ranked) positions win ties
+            best = max(range(len(remaining)),
+                       key=lambda p: (lam * rel[remaining[p]] - (1 - lam) * closest[remaining[p]], -p))
+            j = remaining.pop(best)
+            picked.append(j)
+            department, careers = courses[j].department, courses[j].career_relevance
+            for i in remaining:
+                other = courses[i]
+                if department is not None and other.department == department:
+                    similarity = 1.0
+                else:
+                    union = len(careers | other.career_relevance)
+                    similarity = len(careers & other.career_relevance) / union if union else 0.0
+                if similarity > closest[i]:
+                    closest[i] = similarity
+        return picked
+
+    def _select_quota(self, courses: List[CourseRecord], keep: int) -> List[int]:
+        taken: Dict[Any, int] = {}
+        picked, skipped = [], []
+        for i, course in enumerate(courses):
+            if len(picked) >= keep:
+                break
+            if taken.get(course.department, 0) < self.department_quota:
+                taken[course.department] = taken.get(course.department, 0) + 1
+                picked.append(i)
+            else:
+                skipped.append(i)
+        return picked + skipped[:keep - len(picked)]
+
+
+class CollaborativeSignal:
+    """Co-enrollment similarity and smoothed ratings, maintained from an event stream.
+
+    ``add_enrollment`` bumps the sparse co-enrollment counts of a course with
+    each course already in that student's history, so an event costs the size
+    of one history.  ``compact`` recomputes the cosine top-``neighbors`` lists
+    of only the courses whose counts changed since the last compaction and
+    swaps in a new read-only table; scoring reads that table alone.  Events
+    are idempotent (one enrollment per student/course pair, latest rating
+    wins), so re-reading a log is harmless.  Course and student ids are
+    compared as strings.
+
+    ``score(history)`` blends mean similarity to the history with the
+    smoothed rating, both in [0, 1], for the neighbors of the history only.
+    Every other course scores its rating alone: ``compact`` keeps that
+    rating-only score per rated course (``rating_scores``), and unrated
+    courses share the returned floor.
+    """
+
+    def __init__(self, neighbors: int = 20, rating_share: float = 0.3,
+                 rating_prior: float = 3.0, rating_prior_weight: float = 5.0) -> None:
+        self.neighbors = neighbors
+        self.rating_share = rating_share
+        self.rating_prior = rating_prior
+        self.rating_prior_weight = rating_prior_weight
+        self._histories: Dict[str, set] = {}
+        self._co_counts: Dict[str, Dict[str, int]] = {}
+        self._course_counts: Dict[str, int] = {}
+        self._ratings: Dict[Tuple[str, str], float] = {}
+        self._rating_totals: Dict[str, List[float]] = {}
+        self._dirty: set = set()
+        self._offsets: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        # (neighbors, rating-only scores, generation); replaced as a whole by compact()
+        self._table: Tuple[Dict[str, Tuple[Tuple[str, float], ...]], Dict[str, float], int] = ({}, {}, 0)
+
+    @property
+    def generation(self) -> int:
+        return self._table[2]
+
+    @property
+    def rating_floor(self) -> float:
+        """Rating-only score of a course nobody has rated."""
+        return self.rating_share * ((self.rating_prior - 1.0) / 4.0)
+
+    def snapshot(self) -> Tuple[Any, ...]:
+        """The current read-only table, to score several calls against one generation."""
+        return self._table
+
+    def rating_scores(self, table: Optional[Tuple[Any, ...]] = None) -> Dict[str, float]:
+        """Rating-only score of every rated course; the same dict until the next compact()."""
+        return (table or self._table)[1]
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def history(self, student_id: Any) -> FrozenSet[str]:
+        if student_id is None:
+            return frozenset()
+        with self._lock:
+            return frozenset(self._histories.get(str(student_id), ()))
+
+    def add_enrollment(self, student_id: Any, course_id: Any) -> bool:
+        student, course = str(student_id), str(course_id)
+        with self._lock:
+            history = self._histories.setdefault(student, set())
+            if course in history:
+                return False
+            for other in history:
+                row = self._co_counts.setdefault(course, {})
+                row[other] = row.get(other, 0) + 1
+                row = self._co_counts.setdefault(other, {})
+                row[course] = row.get(course, 0) + 1
+                self._dirty.add(other)
+            history.add(course)
+            self._course_counts[course] = self._course_counts.get(course, 0) + 1
+            self._dirty.add(course)
+        return True
+
+    def add_rating(self, student_id: Any, course_id: Any, rating: float) -> None:
+        """Record a 1-5 rating; a student who rates a course is also counted as enrolled."""
+        student, course = str(student_id), str(course_id)
+        rating = min(5.0, max(1.0, float(rating)))
+        self.add_enrollment(student, course)
+        with self._lock:
+            previous = self._ratings.get((student, course))
+            totals = self._rating_totals.setdefault(course, [0.0, 0])
+            if previous is None:
+                totals[1] += 1
+            else:
+                totals[0] -= previous
+            totals[0] += rating
+            self._ratings[(student, course)] = rating
+            self._dirty.add(course)
+
+    def compact(self) -> int:
+        """Rebuild neighbor lists and rating scores for changed courses; returns the new generation."""
+        with self._lock:
+            if not self._dirty:
+                return self._table[2]
+            neighbors, ratings, generation = self._table
+            neighbors, ratings = dict(neighbors), dict(ratings)
+            # a count change moves the cosine of every pair involving that course
+            stale = set(self._dirty)
+            for course in self._dirty:
+                stale.update(self._co_counts.get(course, ()))
+            counts = self._course_counts
+            for course in stale:
+                row = self._co_counts.get(course)
+                if row:
+                    n = counts[course]
+                    ranked = sorted(((other, together / math.sqrt(n * counts[other]))
+                                     for other, together in row.items()), key=lambda x: (-x[1], x[0]))
+                    neighbors[course] = tuple(ranked[:self.neighbors])
+                totals = self._rating_totals.get(course)
+                if totals is not None and totals[1]:
+                    weight = self.rating_prior_weight
+                    mean = (totals[0] + self.rating_prior * weight) / (totals[1] + weight)
+                    ratings[course] = self.rating_share * ((mean - 1.0) / 4.0)
+            self._dirty.clear()
+            self._table = (neighbors, ratings, generation + 1)
+            return generation + 1
+
+    def score(self, history: Iterable[str],
+              table: Optional[Tuple[Any, ...]] = None) -> Tuple[Dict[str, float], float]:
+        """Scores of the neighbors of ``history``, plus the floor of unrated courses.
+
+        Courses missing from the result score ``rating_scores().get(course, floor)``.
+        """
+        neighbors, ratings, _ = table or self._table
+        history = set(history)
+        share = self.rating_share
+        floor = self.rating_floor
+        similarity: Dict[str, float] = {}
+        for course in history:
+            for other, sim in neighbors.get(course, ()):
+                similarity[other] = similarity.get(other, 0.0) + sim
+        size = max(1, len(history))
+        scores = {course: (1.0 - share) * (total / size) + ratings.get(course, floor)
+                  for course, total in similarity.items()}
+        return scores, floor
+
+    def read_logs(self, enrollments: Optional[Path] = None, feedback: Optional[Path] = None) -> int:
+        """Apply lines appended to api.php's enrollment and feedback logs since the last call."""
+        applied = 0
+        for line in self._new_lines(Path(enrollments) if enrollments else ENROLLMENTS_LOG):
+            fields = dict(part.strip().split("=", 1) for part in line.split("|") if "=" in part)
+            student, course = fields.get("student_id", ""), fields.get("course_id", "")
+            if student not in ("", "0") and course not in ("", "0"):
+                applied += self.add_enrollment(student, course)
+        for line in self._new_lines(Path(feedback) if feedback else FEEDBACK_LOG):
+            try:
+                event = json.loads(line)
+                if event.get("rating") is None or str(event.get("course_id", 0)) in ("", "0"):
+                    continue
+                self.add_rating(event.get("student_id"), event["course_id"], float(event["rating"]))
+                applied += 1
+            except (ValueError, TypeError, AttributeError):
+                logger.warning("Skipping malformed feedback line: %.200s", line)
+        return applied
+
+    def refresh(self, enrollments: Optional[Path] = None, feedback: Optional[Path] = None) -> int:
+        """Tail both logs and compact; returns the current generation."""
+        self.read_logs(enrollments, feedback)
+        return self.compact()
+
+    def _new_lines(self, path: Path) -> List[str]:
+        key = str(path)
+        offset = self._offsets.get(key, 0)
+        try:
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                if f.tell() < offset:  # rotated or truncated
+                    offset = 0
+                f.seek(offset)
+                data = f.read()
+        except OSError:
+            return []
+        # leave a partially written last line for the next read
+        end = data.rfind(b"\n") + 1
+        self._offsets[key] = offset + end
+        return [line for line in data[:end].decode("utf-8", "replace").splitlines() if line.strip()]
+
+
+class CandidateIndex:
+    """Inverted indexes over one CompiledCatalog for pruned top-N scoring.
+
+    ``by_career`` and ``by_major`` map a career tag or a major to the rows
+    that score above the floor on that factor, and ``career_all`` holds rows
+    tagged "All".  ``learning_tiers`` groups every row by its learning score
+    for each known style, best first, so rows outside a student's candidate
+    set can be visited in descending upper-bound order.
+    """
+
+    __slots__ = ("catalog", "by_career", "career_all", "by_major", "learning_tiers", "all_rows",
+                 "code_rows", "id_rows")
+
+    def __init__(self, catalog: CompiledCatalog) -> None:
+        self.catalog = catalog
+        by_career: Dict[str, List[int]] = {}
+        career_all = []
+        code_rows: Dict[str, List[int]] = {}
+        for index, c in enumerate(catalog.courses):
+            code_rows.setdefault(c.code, []).append(index)
+            if "All" in c.career_relevance:
+                career_all.append(index)
+            for tag in c.career_relevance:
+                by_career.setdefault(tag, []).append(index)
+        self.by_career = {tag: tuple(rows) for tag, rows in by_career.items()}
+        self.career_all = tuple(career_all)
+        self.by_major = {
+            major: tuple(sorted(index for code in codes for index in code_rows.get(code, ())))
+            for major, codes in catalog.major_requirements.items()
         }
+        self.all_rows = tuple(range(len(catalog.courses)))
+        self.code_rows = {code: tuple(rows) for code, rows in code_rows.items()}
+        id_rows: Dict[str, List[int]] = {}
+        for index, c in enumerate(catalog.courses):
+            id_rows.setdefault(str(c.id), []).append(index)
+        self.id_rows = {key: tuple(rows) for key, rows in id_rows.items()}
+
+        self.learning_tiers: Dict[str, Tuple[Tuple[float, Tuple[int, ...]], ...]] = {}
+        for style, scores in catalog.learning_scores.items():
+            tiers: Dict[float, List[int]] = {}
+            for index, score in enumerate(scores):
+                tiers.setdefault(score, []).append(index)
+            self.learning_tiers[style] = tuple((score, tuple(rows)) for score, rows in sorted(tiers.items(), reverse=True))
+
+    def candidates(self, career_interests: List[str], major: str) -> set:
+        """Rows with major credit or a career score above the floor for this student."""
+        rows = set(self.by_major.get(major, ()))
+        if career_interests:
+            rows.update(self.career_all)
+            for interest in career_interests:
+                rows.update(self.by_career.get(interest, ()))
+        return rows
+
+
+class CourseRecommendationEngine:
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 cache: Optional[RecommendationCache] = None,
+                 catalog_path: Optional[Path] = None,
+                 snapshot_path: Optional[Path] = None,
+                 prerequisite_policy: str = "filter",
+                 metrics: Optional[MetricsRegistry] = None,
+                 catalog: Optional[CompiledCatalog] = None,
+                 reasoning_templates: Optional[ReasoningTemplates] = None,
+                 collaborative: Optional[CollaborativeSignal] = None,
+                 reranker: Optional[DiversityReranker] = None,
+                 major_requirements: Optional[Mapping[str, Iterable[str]]] = None) -> None:
+        if prerequisite_policy not in ("filter", "downrank"):
+            raise ValueError("prerequisite_policy must be 'filter' or 'downrank'")
+        self.prerequisite_policy = prerequisite_policy
+        self.cache = cache
+        self.metrics = metrics
+        self.reasoning_templates = reasoning_templates or ReasoningTemplates()
+        # only scored when weights also carry a "collaborative" entry
+        self.collaborative = collaborative
+        # (signal table, index, rating-only score per row, peak); see _collaborative_baseline
+        self._collab_baseline: Optional[Tuple[Any, CandidateIndex, Dict[int, float], float]] = None
+        self.reranker = reranker
+        self.catalog_path = Path(catalog_path) if catalog_path else DEFAULT_CATALOG_PATH
+        self.snapshot_path = Path(snapshot_path) if snapshot_path else DEFAULT_SNAPSHOT_PATH
+        self.weights = weights or dict(DEFAULT_WEIGHTS)
+
+        if major_requirements is None:
+            self.major_requirements = self._load_major_requirements()
+        else:
+            self.major_requirements = {major: list(codes) for major, codes in major_requirements.items()}
+        if catalog is None:
+            catalog = load_snapshot(self.snapshot_path, self._catalog_source_hash())
+            if catalog is None:
+                catalog = self._compile_catalog(self._load_courses())
+            else:
+                logger.info("Loaded catalog %s from snapshot %s", catalog.version, self.snapshot_path)
+        self._install_catalog(catalog)
+
+    @property
+    def catalog_version(self) -> str:
+        return self.catalog.version
+
+    def _catalog_source_hash(self) -> bytes:
+        """SHA-256 over everything a snapshot is compiled from: catalog file (or built-in list),
+        majors and the learning-style table behind the precomputed learning scores."""
+        digest = hashlib.sha256(b"format:%d\n" % SNAPSHOT_FORMAT)
+        if self.catalog_path.exists():
+            with open(self.catalog_path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(block)
+        else:
+            digest.update(json.dumps(self._builtin_courses(), sort_keys=True).encode("utf-8"))
+        digest.update(json.dumps(self.major_requirements, sort_keys=True).encode("utf-8"))
+        digest.update(json.dumps(LEARNING_STYLE_COMPATIBILITY, sort_keys=True).encode("utf-8"))
+        return digest.digest()
+
+    def build_snapshot(self, path: Optional[Path] = None) -> Path:
+        """Compile the current catalog sources into a binary snapshot for fast cold starts."""
+        path = Path(path) if path else self.snapshot_path
+        source_hash = self._catalog_source_hash()
+        write_snapshot(path, self._compile_catalog(self._load_courses()), source_hash)
+        logger.info("Wrote catalog snapshot %s", path)
+        return path
+
+    def reload_catalog(self) -> str:
+        """Re-read the catalog file, compile it and atomically swap it in.
+
+        Raises if the file exists but cannot be parsed, leaving the current
+        catalog in place. Returns the new catalog version.
+        """
+        if self.catalog_path.exists():
+            records = self._read_catalog_records(self.catalog_path)
+        else:
+            records = self._build_records(self._builtin_courses())
+        catalog = self._compile_catalog(records)
+        self._install_catalog(catalog)
+        logger.info("Catalog reloaded: version %s, %d courses", catalog.version, len(catalog.courses))
+        return catalog.version
+
+    def _install_catalog(self, catalog: CompiledCatalog, index: Optional[CandidateIndex] = None) -> None:
+        # Requests read self.catalog (or self._index) once, so rebinding it is the atomic swap.
+        self._index = index or CandidateIndex(catalog)
+        self.course_database = list(catalog.courses)
+        self.catalog = catalog
+        if self.cache is not None:
+            self.cache.invalidate()
 
-        self.course_database = self._load_courses()
-        self.major_requirements = self._load_major_requirements()
+    @staticmethod
+    def _read_catalog_records(path: Path) -> List[CourseRecord]:
+        errors: List[Tuple[int, str]] = []
+        records = list(stream_course_records(path, errors))
+        for row, message in errors[:20]:
+            logger.warning("Skipping malformed course at row %d of %s: %s", row, path, message)
+        if errors:
+            logger.warning("Skipped %d malformed course rows in %s", len(errors), path)
+        logger.info("Loaded %d courses from %s", len(records), path)
+        return records
 
-    def _load_courses(self) -> List[Dict[str, Any]]:
-        """Load courses from backend/courses.json if present; otherwise return built-in catalog."""
-        catalog_path = Path(__file__).resolve().parent / "courses.json"
-        if catalog_path.exists():
+    def _load_courses(self) -> List[CourseRecord]:
+        """Load courses from the catalog file if present; otherwise return built-in catalog."""
+        if self.catalog_path.exists():
             try:
-                with open(catalog_path, "r", encoding="utf-8") as f:
-                    data = json.load(f)
-                    logger.info("Loaded %d courses from %s", len(data), catalog_path)
-                    return data
-            except Exception as e:
-                logger.exception("Failed to load courses.json; falling back to built-in catalog")
+                return self._read_catalog_records(self.catalog_path)
+            except (OSError, ValueError) as e:
+                logger.error("Failed to load %s (%s); falling back to built-in catalog", self.catalog_path, e)
+
+        return self._build_records(self._builtin_courses())
 
+    @staticmethod
+    def _builtin_courses() -> List[Dict[str, Any]]:
         return [
   {
     "id": 1,
@@ -488,7 +1685,8 @@ class CourseRecommendationEngine:
   }
 ];
 
-    def _load_major_requirements(self) -> Dict[str, List[str]]:
+    @staticmethod
+    def _load_major_requirements() -> Dict[str, List[str]]:
         return {
             "Technology": ["CS101", "MATH151", "ENG101", "INT008", "INT009", "INT010", "INT011", "INT012", "INT013"],
             "Engineering": ["MATH151", "PHYS101", "CHEM101", "ENG101", "INT003", "INT024", "INT025", "INT026"],
@@ -511,21 +1709,15 @@ class CourseRecommendationEngine:
         matches = sum(1 for interest in student_interests if interest in course_relevance)
         return matches / max(len(student_interests), 1)
 
-    def _match_learning_style(self, student_style, course_styles):
+    @staticmethod
+    def _match_learning_style(student_style, course_styles):
         if not student_style:
             return 0.5
         
         if student_style in course_styles:
             return 1.0
         
-        compatible = {
-            "Visual": ["Hands-on", "Analytical"],
-            "Hands-on": ["Visual", "Analytical"],
-            "Analytical": ["Visual", "Hands-on", "Reading"],
-            "Reading": ["Writing", "Discussion", "Analytical"],
-            "Writing": ["Reading", "Discussion"],
-            "Discussion": ["Reading", "Writing"],
-        }
+        compatible = LEARNING_STYLE_COMPATIBILITY
         
         if student_style in compatible:
             for style in course_styles:
@@ -541,7 +1733,7 @@ class CourseRecommendationEngine:
         return min(1.0, ratio)
 
     def _is_major_requirement(self, course_code: str, major: str) -> bool:
-        return course_code in self.major_requirements.get(major, [])
+        return course_code in self.catalog.major_requirements.get(major, ())
 
     def _calculate_difficulty_match(self, gpa, difficulty):
         student_ceiling = (gpa / 4.0) * 5.0 + 0.5 
@@ -551,7 +1743,49 @@ class CourseRecommendationEngine:
         else:
             return max(0.0, 1.0 - (diff_gap * 0.5))
 
-    def generate_recommendations(self, student_data: Dict[str, Any], top_n: int = 15) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _build_records(courses: Iterable[Mapping[str, Any]]) -> List[CourseRecord]:
+        """Convert raw course dicts into CourseRecords, skipping and logging malformed ones."""
+        records = []
+        for position, course in enumerate(courses):
+            try:
+                records.append(CourseRecord.from_dict(course))
+            except ValueError as e:
+                logger.warning("Skipping malformed course at position %d: %s", position, e)
+        return records
+
+    def _compile_catalog(self, records: Iterable[CourseRecord]) -> CompiledCatalog:
+        """Freeze course records and major_requirements into the structure scoring runs on."""
+        courses = tuple(records)
+
+        majors = {
+            major: frozenset(_intern(code) for code in codes)
+            for major, codes in self.major_requirements.items()
+        }
+
+        styles = set(LEARNING_STYLE_COMPATIBILITY)
+        for c in courses:
+            styles.update(c.learning_style)
+        learning_scores = {
+            style: tuple(self._match_learning_style(style, c.learning_style) for c in courses)
+            for style in styles
+        }
+
+        digest = hashlib.sha1()
+        for c in courses:
+            digest.update(json.dumps(c.to_dict(), sort_keys=True, default=str).encode("utf-8"))
+        digest.update(json.dumps({m: sorted(codes) for m, codes in majors.items()}, sort_keys=True).encode("utf-8"))
+
+        return CompiledCatalog(
+            courses=courses,
+            major_requirements=MappingProxyType(majors),
+            learning_scores=MappingProxyType(learning_scores),
+            version=digest.hexdigest()[:12],
+            prerequisites=PrerequisiteGraph(courses),
+        )
+
+    @staticmethod
+    def _normalize_student(student_data: Dict[str, Any]) -> StudentProfile:
         try:
             gpa = float(student_data.get("gpa", 3.0))
         except (TypeError, ValueError):
@@ -559,6 +1793,9 @@ class CourseRecommendationEngine:
 
         major = student_data.get("major", "Undecided") or "Undecided"
         career_interests = student_data.get("career_interests") or []
+        if isinstance(career_interests, (list, tuple)):
+            # tags are matched by hashing; a non-string interest never matches but still counts
+            career_interests = [i if isinstance(i, str) else str(i) for i in career_interests]
         learning_style = student_data.get("learning_style", "Visual") or "Visual"
         
         try:
@@ -566,14 +1803,292 @@ class CourseRecommendationEngine:
         except (TypeError, ValueError):
             study_hours = 10.0
 
-        recommendations = []
+        completed = student_data.get("completed_courses")
+        if completed is not None:
+            if isinstance(completed, str) or not isinstance(completed, (list, tuple, set, frozenset)):
+                completed = [completed]
+            completed = frozenset(code for code in completed if isinstance(code, str))
+
+        return StudentProfile(gpa, major, career_interests, learning_style, study_hours, completed,
+                              student_data.get("student_id"))
+
+    def _cache_key(self, profile: StudentProfile, top_n: int, detail: str = "full",
+                   catalog: Optional[CompiledCatalog] = None) -> Optional[Tuple]:
+        gpa, major, career_interests, learning_style, study_hours, completed, student_id = profile
+        try:
+            # career scoring ignores interest order but counts duplicates
+            interests = tuple(sorted(career_interests))
+            key = ((catalog or self.catalog).version, tuple(sorted(self.weights.items())), top_n, detail,
+                   self.prerequisite_policy, gpa, major, interests, learning_style, study_hours, completed)
+            if self._collaborative_weight():
+                key += (self.collaborative.generation, str(student_id))
+            if self.reranker is not None:
+                key += self.reranker.key()
+            hash(key)
+        except TypeError:
+            return None
+        return key
+
+    def generate_recommendations(self, student_data: Dict[str, Any], top_n: int = 15,
+                                 detail: str = "full") -> List[Dict[str, Any]]:
+        """Top ``top_n`` courses for one student.
+
+        ``detail`` is one of ``DETAIL_LEVELS``: ``"ids-only"`` returns
+        ``course_id`` and ``course_code``, ``"scores"`` adds
+        ``confidence_score``, and ``"full"`` is the complete result with
+        reasoning, the five factor scores and their weighted contributions.
+        The cheaper levels never build factors or reasoning.
+        """
+        return self.generate_versioned(student_data, top_n, detail)[1]
+
+    def generate_versioned(self, student_data: Dict[str, Any], top_n: int = 15,
+                           detail: str = "full") -> Tuple[str, List[Dict[str, Any]]]:
+        """``generate_recommendations`` plus the version of the catalog the results came from.
+
+        Reading ``catalog_version`` separately can race with a hot reload.
+        """
+        _check_detail(detail)
+        metrics = self.metrics
+        if metrics is None:
+            profile = self._normalize_student(student_data)
+        else:
+            metrics.count("requests")
+            started = time.perf_counter()
+            profile = self._normalize_student(student_data)
+            metrics.observe("normalize", time.perf_counter() - started)
+        state = self._scoring_state()
+        version = state.catalog.version
+        if self.cache is None:
+            return version, self._recommend(profile, top_n, detail, state)
+
+        key = self._cache_key(profile, max(1, int(top_n)), detail, state.catalog)
+        if key is not None:
+            cached = self.cache.get(key)
+            if metrics is not None:
+                metrics.count("cache_hits" if cached is not None else "cache_misses")
+            if cached is not None:
+                return version, cached
+        recs = self._recommend(profile, top_n, detail, state)
+        if key is not None:
+            self.cache.put(key, recs)
+        return version, recs
+
+    def generate_recommendations_batch(self, students: Iterable[Dict[str, Any]], top_n: int = 15,
+                                       detail: str = "full") -> List[List[Dict[str, Any]]]:
+        """Rank many students, in input order, against the same compiled catalog."""
+        return self.generate_versioned_batch(students, top_n, detail)[1]
+
+    def generate_versioned_batch(self, students: Iterable[Dict[str, Any]], top_n: int = 15,
+                                 detail: str = "full") -> Tuple[str, List[List[Dict[str, Any]]]]:
+        """``generate_recommendations_batch`` plus the version of the catalog every list came from."""
+        state = self._scoring_state()
+        return state.catalog.version, list(self._iter_batch(students, top_n, detail, state))
+
+    def iter_recommendations_batch(self, students: Iterable[Dict[str, Any]], top_n: int = 15,
+                                   detail: str = "full") -> Iterator[List[Dict[str, Any]]]:
+        return self._iter_batch(students, top_n, detail, None)
 
-        for course in self.course_database:
-            career_score = self._match_career_interests(career_interests, course.get("career_relevance", []))
-            learning_score = self._match_learning_style(learning_style, course.get("learning_style", []))
-            workload_score = self._calculate_workload_compatibility(study_hours, float(course.get("workload_hours", 8)))
-            difficulty_score = self._calculate_difficulty_match(gpa, int(course.get("difficulty", 3)))
-            is_major_req = self._is_major_requirement(course.get("code", ""), major)
+    def _scoring_state(self) -> CandidateIndex:
+        """What ``_recommend`` scores against; read once per request so a reload cannot split it."""
+        return self._index
+
+    def _iter_batch(self, students: Iterable[Dict[str, Any]], top_n: int, detail: str,
+                    state: Optional[CandidateIndex]) -> Iterator[List[Dict[str, Any]]]:
+        _check_detail(detail)
+        for student_data in students:
+            yield self._recommend(self._normalize_profile(student_data), top_n, detail, state)
+
+    def _normalize_profile(self, student_data: Dict[str, Any]) -> StudentProfile:
+        """``_normalize_student`` plus batch accounting when metrics are attached."""
+        metrics = self.metrics
+        if metrics is None:
+            return self._normalize_student(student_data)
+        metrics.count("requests")
+        started = time.perf_counter()
+        profile = self._normalize_student(student_data)
+        metrics.observe("normalize", time.perf_counter() - started)
+        return profile
+
+    def score_courses(self, student_data: Dict[str, Any]) -> Tuple[CompiledCatalog, List[float]]:
+        """Unrounded confidence of every course, in catalog order, ignoring completed_courses.
+
+        Returns the catalog the scores belong to, so callers stay consistent
+        across a hot reload.
+        """
+        profile = self._normalize_student(student_data)
+        index = self._index
+        collab = self._collaborative_rows(profile, index)
+        scored = self._score_catalog(profile._replace(completed_courses=None), index.catalog, collab=collab)
+        return index.catalog, [t[3] for t in scored]
+
+    def _recommend(self, profile: StudentProfile, top_n: int, detail: str = "full",
+                   state: Optional[CandidateIndex] = None) -> List[Dict[str, Any]]:
+        index = state or self._index
+        catalog = index.catalog
+        keep = max(1, int(top_n))
+        reranker = self.reranker
+        pool = keep if reranker is None else reranker.pool_size(keep)
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+        scored = self._score_candidates(profile, index, pool)
+        courses = catalog.courses
+        major = profile.major
+        if metrics is not None:
+            scored_at = time.perf_counter()
+            metrics.observe("score", scored_at - started)
+            metrics.count("courses_scored", len(scored))
+
+        # Bounded heap keyed like the old full sort, (-confidence, course_code), with
+        # catalog position breaking ties between duplicate codes; only the winners
+        # get result dicts and reasoning strings.
+        winners = heapq.nsmallest(pool, scored, key=lambda x: (x[0], x[1], x[2]))
+        if reranker is not None:
+            positions = reranker.select([w[3] for w in winners], [courses[w[2]] for w in winners], keep)
+            winners = [winners[p] for p in positions]
+        if metrics is not None:
+            selected_at = time.perf_counter()
+            metrics.observe("select", selected_at - scored_at)
+
+        if detail == "full":
+            results = [
+                self._build_result(courses[w[2]], major, w[4], w[3], w[5], w[6], w[7], w[8], w[9],
+                                   collaborative_score=w[10])
+                for w in winners
+            ]
+        else:
+            results = [_brief_result(courses[w[2]], w[3], detail) for w in winners]
+        if metrics is not None:
+            metrics.observe("reasoning", time.perf_counter() - selected_at)
+        return results
+
+    def _score_candidates(self, profile: StudentProfile, index: CandidateIndex, keep: int) -> List[Tuple]:
+        """Score only the courses that can reach the top ``keep``; the winners equal a full scan's.
+
+        Courses outside the index candidates have the career factor at its
+        floor and no major credit, so their confidence is at most their
+        learning tier's with workload and difficulty at 1.0 and, when the
+        collaborative factor is on, the best rating-only score.  Tiers are
+        scored best first until that bound rounds below the keep-th best
+        score found so far.
+        """
+        catalog = index.catalog
+        weights = self.weights
+        career_interests, learning_style = profile.career_interests, profile.learning_style
+        collab = self._collaborative_rows(profile, index)
+        try:
+            if any(w < 0 for w in weights.values()):
+                raise ValueError("negative weights void the upper bound")
+            candidates = index.candidates(career_interests, profile.major)
+        except (TypeError, ValueError):
+            return self._score_catalog(profile, catalog, collab=collab)
+        if collab is not None:
+            # rated rows outside the history's neighbors are covered by the tier bound
+            candidates.update(collab[0])
+
+        scored = self._score_catalog(profile, catalog, sorted(candidates), collab)
+        floor_career = 0.0 if career_interests else 0.5
+        if learning_style:
+            tiers = index.learning_tiers.get(learning_style) or ((0.35, index.all_rows),)
+        else:
+            tiers = ((0.5, index.all_rows),)
+
+        for learning, rows in tiers:
+            if len(scored) >= keep:
+                cutoff = heapq.nsmallest(keep, scored, key=lambda x: (x[0], x[1], x[2]))[-1][0]
+                bound = (
+                    (floor_career * weights["career"]) +
+                    (0.0 * weights["major"]) +
+                    (learning * weights["learning"]) +
+                    (1.0 * weights["workload"]) +
+                    (1.0 * weights["difficulty"])
+                )
+                if collab is not None:
+                    bound = bound + collab[3] * weights["collaborative"]
+                if -round(bound * 100, 2) > cutoff:
+                    break
+            scored.extend(self._score_catalog(profile, catalog, [i for i in rows if i not in candidates], collab))
+        return scored
+
+    def _collaborative_weight(self) -> float:
+        return self.weights.get("collaborative", 0.0) if self.collaborative is not None else 0.0
+
+    def _collaborative_rows(self, profile: StudentProfile,
+                            index: CandidateIndex) -> Optional[Tuple[Dict[int, float], Dict[int, float], float, float]]:
+        """Collaborative factor per catalog row, or None when off; see ``_collaborative_scores``."""
+        if not self._collaborative_weight():
+            return None
+        return self._collaborative_scores(profile, index)
+
+    def _collaborative_scores(self, profile: StudentProfile,
+                              index: CandidateIndex) -> Tuple[Dict[int, float], Dict[int, float], float, float]:
+        """(history-neighbor rows, rating-only rows, floor, peak): a row scores its neighbor
+        value, else its rating-only value, else the floor; no row outside the first
+        dict scores above ``peak``."""
+        signal = self.collaborative
+        table = signal.snapshot()
+        history = set(signal.history(profile.student_id))
+        for code in profile.completed_courses or ():
+            history.update(str(index.catalog.courses[row].id) for row in index.code_rows.get(code, ()))
+        by_course, floor = signal.score(history, table)
+        rows = {row: value for course, value in by_course.items() for row in index.id_rows.get(course, ())}
+        baseline, peak = self._collaborative_baseline(table, index, floor)
+        return rows, baseline, floor, peak
+
+    def _collaborative_baseline(self, table: Tuple[Any, ...], index: CandidateIndex,
+                                floor: float) -> Tuple[Dict[int, float], float]:
+        """Rating-only score per catalog row and their maximum, mapped once per compaction and catalog."""
+        cached = self._collab_baseline
+        if cached is not None and cached[0] is table and cached[1] is index:
+            return cached[2], cached[3]
+        rated = self.collaborative.rating_scores(table)
+        rows = {row: value for course, value in rated.items() for row in index.id_rows.get(course, ())}
+        peak = max(floor, max(rows.values(), default=floor))
+        self._collab_baseline = (table, index, rows, peak)
+        return rows, peak
+
+    def _score_catalog(self, profile: StudentProfile, catalog: CompiledCatalog,
+                       rows: Optional[Iterable[int]] = None,
+                       collab: Optional[Tuple[Dict[int, float], Dict[int, float], float, float]] = None) -> List[Tuple]:
+        """Score every recommendable course, or only catalog ``rows``; tuples are (-rounded
+        confidence, code, index, confidence, is_major_req, career, learning, workload,
+        difficulty, prerequisites_met, collaborative).  ``collab`` comes from
+        ``_collaborative_rows``; without it the collaborative factor is None."""
+        gpa, major, career_interests, learning_style, study_hours, completed = profile[:6]
+        if collab is not None:
+            collab_rows, collab_baseline, collab_floor, _ = collab
+            collab_weight = self.weights["collaborative"]
+
+        courses = catalog.courses
+        required = catalog.major_requirements.get(major, frozenset())
+        if learning_style:
+            learning_scores, default_learning = catalog.learning_scores.get(learning_style), 0.35
+        else:
+            learning_scores, default_learning = None, 0.5
+
+        check_prerequisites = completed is not None
+        if check_prerequisites:
+            direct = catalog.prerequisites.direct
+            done = catalog.prerequisites.completed_mask(completed)
+            drop_ineligible = self.prerequisite_policy == "filter"
+        eligible = None
+        collab_score = None
+
+        scored = []
+
+        for index, c in enumerate(courses) if rows is None else ((i, courses[i]) for i in rows):
+            if check_prerequisites:
+                if c.code in completed:
+                    continue
+                eligible = not (direct[index] & ~done)
+                if not eligible and drop_ineligible:
+                    continue
+
+            career_score = self._match_career_interests(career_interests, c.career_relevance)
+            learning_score = learning_scores[index] if learning_scores is not None else default_learning
+            workload_score = self._calculate_workload_compatibility(study_hours, c.workload_hours)
+            difficulty_score = self._calculate_difficulty_match(gpa, c.difficulty)
+            is_major_req = c.code in required
             major_score = 1.0 if is_major_req else 0.0
 
             total_score = (
@@ -583,61 +2098,1721 @@ class CourseRecommendationEngine:
                 (workload_score * self.weights["workload"]) +
                 (difficulty_score * self.weights["difficulty"])
             )
+            if collab is not None:
+                collab_score = collab_rows.get(index)
+                if collab_score is None:
+                    collab_score = collab_baseline.get(index, collab_floor)
+                total_score = total_score + collab_score * collab_weight
 
             confidence = total_score * 100
+            if eligible is False:
+                confidence *= PREREQUISITE_PENALTY
 
-            reasoning = self._generate_reasoning(course, major, career_score, learning_score, workload_score, difficulty_score)
-
-            recommendations.append({
-                "course_id": course.get("id"),
-                "course_code": course.get("code"),
-                "course_name": course.get("name"),
-                "department": course.get("department"),
-                "credits": course.get("credits"),
-                "confidence_score": round(confidence, 2),
-                "reasoning": reasoning,
-                "is_major_requirement": is_major_req,
-                "factors": {
-                    "career": round(career_score, 2),
-                    "workload": round(workload_score, 2),
-                    "difficulty": round(difficulty_score, 2)
-                }
+            scored.append((-round(confidence, 2), c.code, index, confidence, is_major_req,
+                           career_score, learning_score, workload_score, difficulty_score, eligible,
+                           collab_score))
+
+        return scored
+
+    def _build_result(self, course: CourseRecord, major: str, is_major_req: bool, confidence: float,
+                      career_score: float, learning_score: float, workload_score: float,
+                      difficulty_score: float, prerequisites_met: Optional[bool] = None,
+                      weights: Optional[Mapping[str, float]] = None,
+                      collaborative_score: Optional[float] = None) -> Dict[str, Any]:
+        weights = weights or self.weights
+        reasoning = self._generate_reasoning(course, major, career_score, learning_score, workload_score,
+                                             difficulty_score, is_major_req)
+
+        result = {
+            "course_id": course.id,
+            "course_code": course.code,
+            "course_name": course.name,
+            "department": course.department,
+            "credits": course.credits,
+            "confidence_score": round(confidence, 2),
+            "reasoning": reasoning,
+            "is_major_requirement": is_major_req,
+            "factors": {
+                "career": round(career_score, 2),
+                "major": 1.0 if is_major_req else 0.0,
+                "learning": round(learning_score, 2),
+                "workload": round(workload_score, 2),
+                "difficulty": round(difficulty_score, 2)
+            },
+            "contributions": {
+                "career": round(career_score * weights["career"] * 100, 2),
+                "major": round((1.0 if is_major_req else 0.0) * weights["major"] * 100, 2),
+                "learning": round(learning_score * weights["learning"] * 100, 2),
+                "workload": round(workload_score * weights["workload"] * 100, 2),
+                "difficulty": round(difficulty_score * weights["difficulty"] * 100, 2)
+            }
+        }
+        if collaborative_score is not None:
+            # only passed while the collaborative weight is on, so contributions still sum to the score
+            result["factors"]["collaborative"] = round(collaborative_score, 2)
+            result["contributions"]["collaborative"] = round(
+                collaborative_score * weights["collaborative"] * 100, 2)
+        if prerequisites_met is not None:
+            result["prerequisites_met"] = prerequisites_met
+        return result
+
+    def _generate_reasoning(self, course: CourseRecord, major: str, career_score: float, 
+                          learning_score: float, workload_score: float, difficulty_score: float,
+                          is_major_req: Optional[bool] = None) -> str:
+        if is_major_req is None:
+            is_major_req = self._is_major_requirement(course.code, major)
+        return self.reasoning_templates.render(major, is_major_req, career_score, learning_score,
+                                               workload_score, difficulty_score, course.difficulty)
+
+
+class _CatalogArrays:
+    """Column arrays compiled from one CompiledCatalog; swapped as a unit on reload."""
+
+    __slots__ = ("catalog", "workload", "difficulty", "career_index", "career_matrix", "career_all",
+                 "style_index", "learning_matrix", "major_index", "major_matrix",
+                 "code_rows", "gated_rows", "gated_masks", "index")
+
+    def __init__(self, catalog: CompiledCatalog, index: Optional[CandidateIndex] = None) -> None:
+        _require_numpy()
+        self.catalog = catalog
+        self.index = index or CandidateIndex(catalog)
+        courses = catalog.courses
+        n = len(courses)
+
+        self.workload = np.array([c.workload_hours for c in courses], dtype=float)
+        self.difficulty = np.array([c.difficulty for c in courses], dtype=float)
+
+        self.career_index: Dict[str, int] = {}
+        for c in courses:
+            for career in c.career_relevance:
+                self.career_index.setdefault(career, len(self.career_index))
+        self.career_matrix = np.zeros((n, len(self.career_index)), dtype=float)
+        self.career_all = np.zeros(n, dtype=bool)
+        for i, c in enumerate(courses):
+            for career in c.career_relevance:
+                self.career_matrix[i, self.career_index[career]] = 1.0
+            self.career_all[i] = "All" in c.career_relevance
+
+        # style x course learning factor, plus rows for unknown (0.35) and missing (0.5) styles
+        learning_scores = catalog.learning_scores
+        self.style_index = {style: j for j, style in enumerate(learning_scores)}
+        self.learning_matrix = np.empty((len(self.style_index) + 2, n), dtype=float)
+        for style, j in self.style_index.items():
+            self.learning_matrix[j] = learning_scores[style]
+        self.learning_matrix[-2] = 0.35
+        self.learning_matrix[-1] = 0.5
+
+        required = catalog.major_requirements
+        self.major_index = {major: j for j, major in enumerate(required)}
+        # the extra all-zero row stands in for majors without requirements
+        self.major_matrix = np.zeros((len(self.major_index) + 1, n), dtype=float)
+        for major, j in self.major_index.items():
+            codes = required[major]
+            for i, c in enumerate(courses):
+                if c.code in codes:
+                    self.major_matrix[j, i] = 1.0
+
+        # code -> course rows (sections share a code), and the rows that have prerequisites
+        self.code_rows: Dict[str, List[int]] = {}
+        for i, c in enumerate(courses):
+            self.code_rows.setdefault(c.code, []).append(i)
+        direct = catalog.prerequisites.direct
+        self.gated_rows = [i for i, mask in enumerate(direct) if mask]
+        self.gated_masks = [direct[i] for i in self.gated_rows]
+
+
+class VectorizedRecommendationEngine(CourseRecommendationEngine):
+    """Scores courses with NumPy array ops over a column-compiled catalog.
+
+    Produces exactly the same recommendations as ``CourseRecommendationEngine``:
+    every factor is computed with the same float operations in the same order,
+    and only the few candidates that can reach the top N are turned into result
+    dicts.  Requires numpy.
+    """
+
+    # Students scored per matrix pass; bounds the (students x courses) temporaries.
+    batch_chunk_size = 64
+
+    def __init__(self, weights: Optional[Dict[str, float]] = None,
+                 cache: Optional[RecommendationCache] = None,
+                 catalog_path: Optional[Path] = None,
+                 snapshot_path: Optional[Path] = None,
+                 prerequisite_policy: str = "filter",
+                 metrics: Optional[MetricsRegistry] = None,
+                 catalog: Optional[CompiledCatalog] = None,
+                 reasoning_templates: Optional[ReasoningTemplates] = None,
+                 collaborative: Optional[CollaborativeSignal] = None,
+                 reranker: Optional[DiversityReranker] = None,
+                 major_requirements: Optional[Mapping[str, Iterable[str]]] = None) -> None:
+        try:
+            _require_numpy()
+        except ImportError as e:
+            raise ImportError("VectorizedRecommendationEngine requires numpy") from e
+        super().__init__(weights, cache, catalog_path, snapshot_path, prerequisite_policy, metrics, catalog,
+                         reasoning_templates, collaborative, reranker, major_requirements)
+
+    def _install_catalog(self, catalog: CompiledCatalog, index: Optional[CandidateIndex] = None) -> None:
+        arrays = _CatalogArrays(catalog, index)
+        self._arrays = arrays
+        super()._install_catalog(catalog, arrays.index)
+
+    def _factor_matrices(self, profiles: List[StudentProfile],
+                         arrays: Optional[_CatalogArrays] = None):
+        """Return (career, major, learning, workload, difficulty) arrays of shape (students, courses)."""
+        arrays = arrays or self._arrays
+        k = len(profiles)
+        n = len(arrays.catalog.courses)
+
+        gpa = np.array([p.gpa for p in profiles], dtype=float)[:, None]
+        study_hours = np.array([p.study_hours for p in profiles], dtype=float)[:, None]
+
+        counts = np.zeros((k, len(arrays.career_index)), dtype=float)
+        lengths = np.ones(k, dtype=float)
+        no_interests = np.zeros(k, dtype=bool)
+        for row, profile in enumerate(profiles):
+            interests = profile.career_interests
+            if not interests:
+                no_interests[row] = True
+                continue
+            lengths[row] = len(interests)
+            for interest in interests:
+                j = arrays.career_index.get(interest)
+                if j is not None:
+                    counts[row, j] += 1.0
+        career = (counts @ arrays.career_matrix.T) / lengths[:, None]
+        career = np.where(no_interests[:, None] | arrays.career_all[None, :], 0.5, career)
+
+        unknown_style = len(arrays.style_index)
+        style_rows = np.array([
+            arrays.style_index.get(p.learning_style, unknown_style) if p.learning_style else unknown_style + 1
+            for p in profiles
+        ])
+        learning = arrays.learning_matrix[style_rows]
+
+        positive = arrays.workload > 0
+        ratio = np.ones((k, n), dtype=float)
+        np.divide(study_hours, arrays.workload, out=ratio, where=positive[None, :])
+        workload = np.where(ratio < 1.0, ratio, 1.0)
+
+        ceiling = (gpa / 4.0) * 5.0 + 0.5
+        gap = arrays.difficulty - ceiling
+        easier = 1.0 - (np.abs(gap) * 0.1)
+        harder = 1.0 - (gap * 0.5)
+        difficulty = np.where(
+            gap <= 0,
+            np.where(easier > 0.8, easier, 0.8),
+            np.where(harder > 0.0, harder, 0.0),
+        )
+
+        missing = len(arrays.major_index)
+        major_rows = np.array([arrays.major_index.get(p.major, missing) for p in profiles])
+        major = arrays.major_matrix[major_rows]
+
+        return career, major, learning, workload, difficulty
+
+    def _confidence(self, career, major, learning, workload, difficulty,
+                    weights: Optional[Dict[str, float]] = None, collaborative=None):
+        weights = weights or self.weights
+        total = (
+            (career * weights["career"]) +
+            (major * weights["major"]) +
+            (learning * weights["learning"]) +
+            (workload * weights["workload"]) +
+            (difficulty * weights["difficulty"])
+        )
+        if collaborative is not None and weights.get("collaborative"):
+            total = total + collaborative * weights["collaborative"]
+        return total * 100
+
+    def _collaborative_matrix(self, profiles: List[StudentProfile], arrays: _CatalogArrays):
+        """(students x courses) collaborative factor, or None without a collaborative signal."""
+        if self.collaborative is None:
+            return None
+        matrix = np.empty((len(profiles), len(arrays.catalog.courses)), dtype=float)
+        baseline_row = (None, None)
+        for row, profile in enumerate(profiles):
+            scores, baseline, floor, _ = self._collaborative_scores(profile, arrays.index)
+            if baseline_row[0] is not baseline:
+                # one rating-only row per compaction, copied into each student's row
+                vector = np.full(matrix.shape[1], floor)
+                if baseline:
+                    vector[list(baseline)] = list(baseline.values())
+                baseline_row = (baseline, vector)
+            matrix[row] = baseline_row[1]
+            if scores:
+                matrix[row, list(scores)] = list(scores.values())
+        return matrix
+
+    def score_students(self, students: List[Dict[str, Any]]):
+        """Unrounded confidence scores as a (students x courses) array, in catalog order."""
+        profiles = [self._normalize_student(s) for s in students]
+        return self._confidence(*self._factor_matrices(profiles))
+
+    def _scoring_state(self) -> _CatalogArrays:
+        return self._arrays
+
+    def _recommend(self, profile: StudentProfile, top_n: int, detail: str = "full",
+                   state: Optional[_CatalogArrays] = None) -> List[Dict[str, Any]]:
+        return next(self._recommend_profiles([profile], max(1, int(top_n)), detail, state))
+
+    def factorize_cohort(self, students: Iterable[Dict[str, Any]]) -> "CohortFactors":
+        """Compute the weight-independent factor matrices of a cohort once, for fast re-ranking."""
+        profiles = [self._normalize_student(s) for s in students]
+        arrays = self._arrays
+        return CohortFactors(self, profiles, arrays, self._factor_matrices(profiles, arrays),
+                             self._collaborative_matrix(profiles, arrays))
+
+    def score_courses(self, student_data: Dict[str, Any]) -> Tuple[CompiledCatalog, List[float]]:
+        profile = self._normalize_student(student_data)
+        arrays = self._arrays
+        collaborative = self._collaborative_matrix([profile], arrays) if self._collaborative_weight() else None
+        profile = profile._replace(completed_courses=None)
+        confidence = self._confidence(*self._factor_matrices([profile], arrays), collaborative=collaborative)[0]
+        return arrays.catalog, confidence.tolist()
+
+    def _iter_batch(self, students: Iterable[Dict[str, Any]], top_n: int, detail: str,
+                    state: Optional[_CatalogArrays]) -> Iterator[List[Dict[str, Any]]]:
+        _check_detail(detail)
+        keep = max(1, int(top_n))
+        chunk: List[StudentProfile] = []
+        for student_data in students:
+            chunk.append(self._normalize_profile(student_data))
+            if len(chunk) >= self.batch_chunk_size:
+                yield from self._recommend_profiles(chunk, keep, detail, state)
+                chunk = []
+        if chunk:
+            yield from self._recommend_profiles(chunk, keep, detail, state)
+
+    def _recommend_profiles(self, profiles, keep: int, detail: str = "full",
+                            arrays: Optional[_CatalogArrays] = None) -> Iterator[List[Dict[str, Any]]]:
+        arrays = arrays or self._arrays
+        metrics = self.metrics
+        if metrics is not None:
+            started = time.perf_counter()
+        factors = self._factor_matrices(profiles, arrays)
+        collaborative = self._collaborative_matrix(profiles, arrays) if self._collaborative_weight() else None
+        confidence = self._confidence(*factors, collaborative=collaborative)
+        if metrics is not None:
+            metrics.observe("score", time.perf_counter() - started)
+            metrics.count("courses_scored", confidence.size)
+        return self._rank_profiles(profiles, arrays, factors, confidence, keep, detail,
+                                   collaborative=collaborative)
+
+    def _rank_profiles(self, profiles, arrays: _CatalogArrays, factors, confidence,
+                       keep: int, detail: str = "full",
+                       weights: Optional[Mapping[str, float]] = None,
+                       collaborative=None) -> Iterator[List[Dict[str, Any]]]:
+        metrics = self.metrics
+        if collaborative is not None and not (weights or self.weights).get("collaborative"):
+            collaborative = None
+        reranker = self.reranker
+        pool_keep = keep if reranker is None else reranker.pool_size(keep)
+        career, major, learning, workload, difficulty = factors
+        n = confidence.shape[1]
+        courses = arrays.catalog.courses
+
+        for row, profile in enumerate(profiles):
+            if metrics is not None:
+                started = time.perf_counter()
+            scores = confidence[row]
+            eligible = None
+            pool = None
+            if profile.completed_courses is not None:
+                allowed = np.ones(n, dtype=bool)
+                for code in profile.completed_courses:
+                    allowed[arrays.code_rows.get(code, [])] = False
+                done = arrays.catalog.prerequisites.completed_mask(profile.completed_courses)
+                blocked = [i for i, mask in zip(arrays.gated_rows, arrays.gated_masks) if mask & ~done]
+                eligible = np.ones(n, dtype=bool)
+                eligible[blocked] = False
+                if self.prerequisite_policy == "filter":
+                    allowed[blocked] = False
+                else:
+                    scores = scores.copy()
+                    scores[blocked] *= PREREQUISITE_PENALTY
+                pool = np.flatnonzero(allowed)
+
+            if pool is None:
+                if n <= pool_keep:
+                    candidates = range(n)
+                else:
+                    candidates = self._top_candidates(scores, pool_keep)
+            elif len(pool) <= pool_keep:
+                candidates = pool
+            else:
+                candidates = pool[self._top_candidates(scores[pool], pool_keep)]
+            # candidates are in catalog order, so this matches the heap's (score, code, row) order
+            ranked = sorted(candidates, key=lambda i: (-round(float(scores[i]), 2), courses[i].code))[:pool_keep]
+            if reranker is not None:
+                positions = reranker.select([float(scores[i]) for i in ranked], [courses[i] for i in ranked], keep)
+                ranked = [ranked[p] for p in positions]
+            if metrics is not None:
+                selected_at = time.perf_counter()
+                metrics.observe("select", selected_at - started)
+
+            if detail == "full":
+                results = [
+                    self._build_result(
+                        courses[i], profile.major, bool(major[row, i]), float(scores[i]),
+                        float(career[row, i]), float(learning[row, i]),
+                        float(workload[row, i]), float(difficulty[row, i]),
+                        None if eligible is None else bool(eligible[i]), weights,
+                        None if collaborative is None else float(collaborative[row, i]),
+                    )
+                    for i in ranked
+                ]
+            else:
+                results = [_brief_result(courses[i], float(scores[i]), detail) for i in ranked]
+            if metrics is not None:
+                metrics.observe("reasoning", time.perf_counter() - selected_at)
+            yield results
+
+    @staticmethod
+    def _top_candidates(scores, keep: int):
+        """Indices of every score that can still rank in the top ``keep`` once rounded."""
+        n = len(scores)
+        # Rounding to 2 places moves a score by at most 0.005, so nothing
+        # below this margin can tie or beat the keep-th best after rounding.
+        cutoff = np.partition(scores, n - keep)[n - keep]
+        return np.flatnonzero(scores >= cutoff - 0.011)
+
+
+class CohortFactors:
+    """The five factor matrices of a fixed cohort against one catalog.
+
+    None of the factors depend on the weights, so ranking the cohort under a
+    new weight set is one weighted sum over the stored (students x courses)
+    matrices plus top-N selection.  The sum runs in the engine's order, so
+    ``rank(w)`` equals a fresh ``generate_recommendations_batch`` on an engine
+    built with weights ``w``.  Memory is five float64 matrices, six when the
+    engine has a collaborative signal (weighted by ``w["collaborative"]``):
+    size cohorts accordingly.
+    """
+
+    def __init__(self, engine: VectorizedRecommendationEngine, profiles: List[StudentProfile],
+                 arrays: _CatalogArrays, factors: Tuple[Any, ...], collaborative=None) -> None:
+        self.engine = engine
+        self.profiles = profiles
+        self.arrays = arrays
+        self.factors = factors
+        self.collaborative = collaborative
+
+    @property
+    def catalog_version(self) -> str:
+        return self.arrays.catalog.version
+
+    def _weights(self, weights: Optional[Mapping[str, float]]) -> Dict[str, float]:
+        # keys missing from a candidate weight set keep the engine's value
+        return dict(self.engine.weights, **(weights or {}))
+
+    def scores(self, weights: Optional[Mapping[str, float]] = None):
+        """Unrounded confidence as a (students x courses) array under ``weights``."""
+        return self.engine._confidence(*self.factors, weights=self._weights(weights),
+                                       collaborative=self.collaborative)
+
+    def rank(self, weights: Optional[Mapping[str, float]] = None, top_n: int = 15) -> List[List[Dict[str, Any]]]:
+        weights = self._weights(weights)
+        confidence = self.engine._confidence(*self.factors, weights=weights, collaborative=self.collaborative)
+        return list(self.engine._rank_profiles(self.profiles, self.arrays, self.factors, confidence,
+                                               max(1, int(top_n)), weights=weights,
+                                               collaborative=self.collaborative))
+
+    def compare(self, weights_a: Optional[Mapping[str, float]], weights_b: Optional[Mapping[str, float]],
+                top_n: int = 15) -> Dict[str, Any]:
+        """Rank the cohort under two weight sets and summarize how the lists differ."""
+        ranked_a, ranked_b = self.rank(weights_a, top_n), self.rank(weights_b, top_n)
+        overlap = []
+        top1_changed = lists_changed = 0
+        for recs_a, recs_b in zip(ranked_a, ranked_b):
+            codes_a = [r["course_code"] for r in recs_a]
+            codes_b = [r["course_code"] for r in recs_b]
+            overlap.append(len(set(codes_a) & set(codes_b)) / max(1, len(codes_a), len(codes_b)))
+            top1_changed += codes_a[:1] != codes_b[:1]
+            lists_changed += codes_a != codes_b
+
+        def mean_confidence(ranked: List[List[Dict[str, Any]]]) -> float:
+            values = [r["confidence_score"] for recs in ranked for r in recs]
+            return round(sum(values) / len(values), 2) if values else 0.0
+
+        return {
+            "a": ranked_a,
+            "b": ranked_b,
+            "summary": {
+                "students": len(self.profiles),
+                "mean_overlap": round(sum(overlap) / len(overlap), 4) if overlap else 1.0,
+                "top1_changed": top1_changed,
+                "lists_changed": lists_changed,
+                "mean_confidence_a": mean_confidence(ranked_a),
+                "mean_confidence_b": mean_confidence(ranked_b),
+            },
+        }
+
+
+_worker_engine: Optional[CourseRecommendationEngine] = None
+
+
+def _init_cohort_worker(engine_class: type, options: Dict[str, Any], snapshot_path: str, token: bytes,
+                        log_file: Optional[Path] = None) -> None:
+    global _worker_engine, _log_listener, _log_handler
+    if log_file is not None:
+        import multiprocessing.util
+
+        # A forked worker inherits the parent's queue handler but not its listener
+        # thread; drop both and write a file of its own.
+        if _log_handler is not None:
+            logging.getLogger().removeHandler(_log_handler)
+        _log_listener = _log_handler = None
+        configure_logging(log_file, per_process=True)
+        # pool workers leave through multiprocessing's exit hooks, not atexit
+        multiprocessing.util.Finalize(None, stop_logging, exitpriority=10)
+    catalog = load_snapshot(Path(snapshot_path), token)
+    if catalog is None:
+        raise RuntimeError("Cohort snapshot %s is missing or unreadable" % snapshot_path)
+    _worker_engine = engine_class(catalog=catalog, **options)
+    logger.info("Cohort worker %d ready with catalog %s", os.getpid(), catalog.version)
+
+
+def _score_cohort_chunk(students: List[Dict[str, Any]], top_n: int,
+                        detail: str = "full") -> List[List[Dict[str, Any]]]:
+    return _worker_engine.generate_recommendations_batch(students, top_n, detail)
+
+
+class ParallelCohortScorer:
+    """Shards cohort scoring across a process pool, one warm engine per worker.
+
+    The engine's current catalog is written once to a temporary snapshot that
+    every worker memory-maps in its initializer, so tasks only carry student
+    chunks.  Results are yielded in input order as soon as the chunk at the
+    head of the queue finishes, with at most ``max_pending`` chunks in flight.
+    The scorer pins the catalog it was built with; make a new one after a
+    reload.
+    """
+
+    def __init__(self, engine: CourseRecommendationEngine, workers: Optional[int] = None,
+                 chunk_size: int = 64, max_pending: Optional[int] = None) -> None:
+        import concurrent.futures
+        import tempfile
+
+        self.engine = engine
+        self.workers = workers or os.cpu_count() or 1
+        self.chunk_size = chunk_size
+        self.max_pending = max_pending or self.workers * 2
+        self.catalog = engine.catalog
+
+        fd, self._snapshot_path = tempfile.mkstemp(prefix="cohort-", suffix=".snapshot")
+        os.close(fd)
+        token = os.urandom(32)
+        write_snapshot(Path(self._snapshot_path), self.catalog, token)
+        options = {
+            "weights": dict(engine.weights),
+            "catalog_path": engine.catalog_path,
+            "snapshot_path": engine.snapshot_path,
+            "prerequisite_policy": engine.prerequisite_policy,
+            "reasoning_templates": engine.reasoning_templates,
+            "collaborative": engine.collaborative,
+            "reranker": engine.reranker,
+            "major_requirements": engine.major_requirements,
+        }
+        self._executor = concurrent.futures.ProcessPoolExecutor(
+            self.workers, initializer=_init_cohort_worker,
+            initargs=(type(engine), options, self._snapshot_path, token,
+                      _log_file if _log_listener is not None else None),
+        )
+
+    @property
+    def catalog_version(self) -> str:
+        return self.catalog.version
+
+    def generate_recommendations(self, student_data: Dict[str, Any], top_n: int = 15,
+                                 detail: str = "full") -> List[Dict[str, Any]]:
+        return self.engine.generate_recommendations(student_data, top_n, detail)
+
+    def generate_versioned(self, student_data: Dict[str, Any], top_n: int = 15,
+                           detail: str = "full") -> Tuple[str, List[Dict[str, Any]]]:
+        return self.engine.generate_versioned(student_data, top_n, detail)
+
+    def generate_recommendations_batch(self, students: Iterable[Dict[str, Any]], top_n: int = 15,
+                                       detail: str = "full") -> List[List[Dict[str, Any]]]:
+        return list(self.iter_recommendations_batch(students, top_n, detail))
+
+    def generate_versioned_batch(self, students: Iterable[Dict[str, Any]], top_n: int = 15,
+                                 detail: str = "full") -> Tuple[str, List[List[Dict[str, Any]]]]:
+        return self.catalog.version, self.generate_recommendations_batch(students, top_n, detail)
+
+    def iter_recommendations_batch(self, students: Iterable[Dict[str, Any]], top_n: int = 15,
+                                   detail: str = "full") -> Iterator[List[Dict[str, Any]]]:
+        _check_detail(detail)
+        pending: "deque[concurrent.futures.Future]" = deque()
+        chunk: List[Dict[str, Any]] = []
+        try:
+            for student_data in students:
+                chunk.append(student_data)
+                if len(chunk) < self.chunk_size:
+                    continue
+                pending.append(self._executor.submit(_score_cohort_chunk, chunk, top_n, detail))
+                chunk = []
+                if len(pending) >= self.max_pending:
+                    yield from pending.popleft().result()
+            if chunk:
+                pending.append(self._executor.submit(_score_cohort_chunk, chunk, top_n, detail))
+            while pending:
+                yield from pending.popleft().result()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    def close(self) -> None:
+        self._executor.shutdown()
+        try:
+            os.unlink(self._snapshot_path)
+        except OSError:
+            pass
+
+    def __enter__(self) -> "ParallelCohortScorer":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class CatalogManager:
+    """Watches an engine's catalog file and hot-swaps recompiled catalogs.
+
+    ``check`` compares the file's mtime and size with the last seen values and,
+    on change, calls ``engine.reload_catalog``.  Parsing and compiling happen on
+    the caller's thread (the watcher thread when started), never on the request
+    path; requests keep using the old catalog until the swap.  The watcher
+    thread also tails and compacts the engine's collaborative signal, if any.
+    """
+
+    def __init__(self, engine: CourseRecommendationEngine, interval: float = 5.0) -> None:
+        self.engine = engine
+        self.interval = interval
+        self._signature = self._stat()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _stat(self) -> Optional[Tuple[int, int]]:
+        try:
+            st = os.stat(self.engine.catalog_path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def check(self) -> bool:
+        """Reload if the catalog file changed; returns True when a new catalog was swapped in."""
+        signature = self._stat()
+        if signature == self._signature:
+            return False
+        # Remember the signature even on failure so a broken file is not re-parsed every poll.
+        self._signature = signature
+        try:
+            self.engine.reload_catalog()
+        except Exception:
+            logger.exception("Catalog reload failed; keeping version %s", self.engine.catalog_version)
+            return False
+        return True
+
+    def start(self) -> None:
+        if self._thread is not None:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="catalog-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.check()
+            if self.engine.collaborative is not None:
+                try:
+                    self.engine.collaborative.refresh()
+                except Exception:
+                    logger.exception("Collaborative signal refresh failed")
+
+
+class _SearchBudget:
+    """Node and wall-clock limits shared by one planning search."""
+
+    def __init__(self, time_budget: float, node_budget: int) -> None:
+        self.deadline = time.monotonic() + time_budget
+        self.node_budget = node_budget
+        self.nodes = 0
+        self.exhausted = False
+
+    def spend(self) -> bool:
+        """Count one node; returns False once either limit is hit."""
+        self.nodes += 1
+        if self.nodes >= self.node_budget or (self.nodes % 256 == 0 and time.monotonic() >= self.deadline):
+            self.exhausted = True
+        return not self.exhausted
+
+
+class _PlanOption(NamedTuple):
+    index: int
+    code: str
+    value: float
+    credits: int
+    hours: float
+    needs: int
+    bit: int
+
+
+class DegreePlanner:
+    """Multi-semester plans from engine scores, major requirements and prerequisites.
+
+    Beam search over terms: each search state is the set of courses taken so
+    far (states reaching the same set are merged, keeping the best), and each
+    term is expanded into the best few credit- and hour-feasible bundles of
+    courses whose prerequisites were finished in earlier terms.  The search
+    stops at ``time_budget`` seconds or ``node_budget`` bundle nodes; a term
+    whose search was cut short is discarded, and the best state with only
+    fully searched terms is completed greedily, so a full plan is always
+    returned.
+    """
+
+    def __init__(self, engine: CourseRecommendationEngine, beam_width: int = 8, branching: int = 6,
+                 candidate_limit: int = 14, time_budget: float = 0.5, node_budget: int = 20000) -> None:
+        self.engine = engine
+        self.beam_width = beam_width
+        self.branching = branching
+        self.candidate_limit = candidate_limit
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+
+    def plan(self, student_data: Dict[str, Any], semesters: int = 4, max_credits: int = 15,
+             max_weekly_hours: Optional[float] = None, max_courses: Optional[int] = None) -> Dict[str, Any]:
+        started = time.monotonic()
+        budget = _SearchBudget(self.time_budget, self.node_budget)
+        profile = self.engine._normalize_student(student_data)
+        catalog, scores = self.engine.score_courses(student_data)
+        graph = catalog.prerequisites
+        completed = profile.completed_courses or frozenset()
+        hours_cap = profile.study_hours if max_weekly_hours is None else float(max_weekly_hours)
+        caps = (max_credits, hours_cap, max_courses if max_courses is not None else len(catalog.courses))
+
+        # One option per course code (the best-scoring section), best first.
+        best: Dict[str, int] = {}
+        for index, c in enumerate(catalog.courses):
+            if c.code in completed:
+                continue
+            if c.code not in best or scores[index] > scores[best[c.code]]:
+                best[c.code] = index
+        options = sorted(
+            (_PlanOption(i, catalog.courses[i].code, scores[i], catalog.courses[i].credits or 0,
+                         catalog.courses[i].workload_hours, graph.direct[i], graph.bits.get(catalog.courses[i].code, 0))
+             for i in best.values()),
+            key=lambda o: (-o.value, o.code),
+        )
+
+        # state: taken codes -> (value, done mask, terms)
+        beam = [(0.0, frozenset(), graph.completed_mask(completed), ())]
+        for _ in range(semesters):
+            if budget.exhausted:
+                break
+            expanded: Dict[FrozenSet[str], Tuple] = {}
+            for value, taken, done, terms in beam:
+                eligible = [o for o in options if o.code not in taken and not (o.needs & ~done)]
+                bundles = self._term_bundles(eligible[:self.candidate_limit], caps, budget)
+                if budget.exhausted:
+                    # a truncated search; this state's term is left to the greedy completion
+                    break
+                for bundle_value, bundle in bundles or [(0.0, ())]:
+                    new_taken = taken.union(o.code for o in bundle)
+                    state = (value + bundle_value, new_taken, done | self._mask(bundle), terms + (bundle,))
+                    current = expanded.get(new_taken)
+                    if current is None or state[0] > current[0]:
+                        expanded[new_taken] = state
+            if expanded:
+                beam = sorted(expanded.values(), key=lambda st: (-st[0], sorted(st[1])))[:self.beam_width]
+
+        value, taken, done, terms = beam[0]
+        while len(terms) < semesters:
+            eligible = [o for o in options if o.code not in taken and not (o.needs & ~done)]
+            bundle = self._greedy_bundle(eligible, caps)
+            value += sum(o.value for o in bundle)
+            taken = taken.union(o.code for o in bundle)
+            done |= self._mask(bundle)
+            terms += (bundle,)
+
+        required = catalog.major_requirements.get(profile.major, frozenset())
+        return {
+            "catalog_version": catalog.version,
+            "semesters": [self._describe_term(number, bundle, catalog) for number, bundle in enumerate(terms, 1)],
+            "total_score": round(value, 2),
+            "unscheduled_requirements": sorted(required - taken - completed),
+            "search": {
+                "complete": not budget.exhausted,
+                "nodes": budget.nodes,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+            },
+        }
+
+    @staticmethod
+    def _mask(bundle: Tuple[_PlanOption, ...]) -> int:
+        mask = 0
+        for o in bundle:
+            mask |= o.bit
+        return mask
+
+    def _term_bundles(self, eligible: List[_PlanOption], caps: Tuple[int, float, int],
+                      budget: _SearchBudget) -> List[Tuple[float, Tuple[_PlanOption, ...]]]:
+        """Best ``branching`` feasible bundles by depth-first branch and bound over value-sorted options."""
+        max_credits, max_hours, max_courses = caps
+        # Options are sorted by value, so the next k options bound any k more picks.
+        prefix = [0.0]
+        for o in eligible:
+            prefix.append(prefix[-1] + max(o.value, 0.0))
+        min_credits = min((o.credits for o in eligible if o.credits > 0), default=0)
+        min_hours = min((o.hours for o in eligible if o.hours > 0), default=0.0)
+        found: List[Tuple[float, int, Tuple[_PlanOption, ...]]] = []
+        counter = 0
+
+        def slots_left(credits: int, hours: float, taken: int) -> int:
+            slots = max_courses - taken
+            if min_credits:
+                slots = min(slots, (max_credits - credits) // min_credits)
+            if min_hours:
+                slots = min(slots, int((max_hours - hours) // min_hours))
+            return max(slots, 0)
+
+        def visit(start: int, value: float, credits: int, hours: float, chosen: Tuple[_PlanOption, ...]) -> None:
+            nonlocal counter
+            if chosen:
+                counter += 1
+                entry = (value, -counter, chosen)
+                if len(found) < self.branching:
+                    heapq.heappush(found, entry)
+                elif value > found[0][0]:
+                    heapq.heapreplace(found, entry)
+            k = slots_left(credits, hours, len(chosen))
+            for i in range(start, len(eligible)):
+                bound = value + prefix[min(i + k, len(eligible))] - prefix[i]
+                if k == 0 or (len(found) >= self.branching and bound <= found[0][0]):
+                    return
+                if not budget.spend():
+                    return
+                o = eligible[i]
+                if credits + o.credits <= max_credits and hours + o.hours <= max_hours:
+                    visit(i + 1, value + o.value, credits + o.credits, hours + o.hours, chosen + (o,))
+
+        visit(0, 0.0, 0, 0.0, ())
+        return [(value, chosen) for value, _, chosen in sorted(found, reverse=True)]
+
+    @staticmethod
+    def _greedy_bundle(eligible: List[_PlanOption], caps: Tuple[int, float, int]) -> Tuple[_PlanOption, ...]:
+        max_credits, max_hours, max_courses = caps
+        bundle: List[_PlanOption] = []
+        credits, hours = 0, 0.0
+        for o in eligible:
+            if len(bundle) >= max_courses:
+                break
+            if credits + o.credits <= max_credits and hours + o.hours <= max_hours:
+                bundle.append(o)
+                credits += o.credits
+                hours += o.hours
+        return tuple(bundle)
+
+    @staticmethod
+    def _describe_term(number: int, bundle: Tuple[_PlanOption, ...], catalog: CompiledCatalog) -> Dict[str, Any]:
+        courses = []
+        for o in bundle:
+            c = catalog.courses[o.index]
+            courses.append({
+                "course_id": c.id,
+                "course_code": c.code,
+                "course_name": c.name,
+                "credits": c.credits,
+                "workload_hours": c.workload_hours,
+                "confidence_score": round(o.value, 2),
             })
-        recommendations.sort(key=lambda x: (-x["confidence_score"], x.get("course_code", "")))
-        
-        return recommendations[:max(1, int(top_n))]
+        return {
+            "term": number,
+            "courses": courses,
+            "credits": sum(o.credits for o in bundle),
+            "workload_hours": sum(o.hours for o in bundle),
+        }
 
-    def _generate_reasoning(self, course: Dict[str, Any], major: str, career_score: float, 
-                          learning_score: float, workload_score: float, difficulty_score: float) -> str:
-        reasons = []
-        if self._is_major_requirement(course.get("code", ""), major):
-            reasons.append(f"Required for {major} major")
-        if career_score > 0.7:
-            reasons.append("Strong alignment with career interests")
-        elif career_score > 0.4:
-            reasons.append("Relevant to career goals")
-        if learning_score > 0.8:
-            reasons.append("Matches learning style perfectly")
-        if workload_score > 0.8:
-            reasons.append("Workload fits study schedule")
-        elif workload_score < 0.5:
-            reasons.append("Challenging workload")
-        if difficulty_score > 0.8:
-            reasons.append("Good match for academic level")
-        elif difficulty_score < 0.6:
-            reasons.append("May require extra effort")
-        if int(course.get("difficulty", 3)) <= 2:
-            reasons.append("Great foundational course")
-        return " • ".join(reasons) if reasons else "General education requirement"
+
+_DAY_INDEX = {"M": 0, "T": 1, "W": 2, "R": 3, "F": 4, "S": 5, "U": 6,
+              "MON": 0, "TUE": 1, "WED": 2, "THU": 3, "FRI": 4, "SAT": 5, "SUN": 6}
+
+
+def _parse_minutes(value: Any) -> int:
+    hours, minutes = str(value).split(":")
+    total = int(hours) * 60 + int(minutes)
+    if not 0 <= total <= 24 * 60:
+        raise ValueError("time out of range: %r" % value)
+    return total
+
+
+def _meeting_mask(meeting: Mapping[str, Any], slot_minutes: int) -> int:
+    """Bitmask of the week's ``slot_minutes`` slots a meeting occupies.
+
+    ``days`` is a string of day letters (``"MWF"``, R = Thursday, S/U = weekend)
+    or a list of day names; ``start``/``end`` are ``"HH:MM"``.
+    """
+    days = meeting["days"]
+    days = list(days) if isinstance(days, str) else [str(day)[:3] for day in days]
+    start, end = _parse_minutes(meeting["start"]), _parse_minutes(meeting["end"])
+    if end <= start:
+        raise ValueError("meeting ends before it starts")
+    per_day = (24 * 60) // slot_minutes
+    first, last = start // slot_minutes, -(-end // slot_minutes)
+    span = ((1 << (last - first)) - 1) << first
+    mask = 0
+    for day in days:
+        mask |= span << (_DAY_INDEX[day.upper()] * per_day)
+    return mask
+
+
+def load_sections(path: Path) -> Dict[str, List[Dict[str, Any]]]:
+    """Read ``{course_code: [{"section": id, "meetings": [{"days", "start", "end"}, ...]}, ...]}``."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict):
+        raise ValueError("Sections file must map course codes to section lists")
+    return data
+
+
+class _SectionOption(NamedTuple):
+    index: int
+    code: str
+    value: float
+    credits: int
+    hours: float
+    sections: Tuple[Tuple[int, Any, Any], ...]  # (slot mask, section id, meetings)
+
+
+class SectionScheduler:
+    """Highest-scoring conflict-free, workload-feasible set of course sections.
+
+    Every section's meetings are compiled into one bitmask over the week at
+    ``slot_minutes`` resolution, so a time-conflict test is a single AND.
+    Depth-first branch and bound over the ``candidate_limit`` best eligible
+    courses (one option per code, best first) picks at most one section per
+    course under the credit, weekly-hour and course-count caps; the bound is
+    the current value plus the best remaining values that could still fit,
+    and a greedy first-fit bundle seeds the incumbent.  The search stops at
+    ``time_budget`` seconds or ``node_budget`` nodes and returns the best
+    bundle found.  Courses without section data have no fixed meetings and
+    are only considered with ``allow_unscheduled``.
+    """
+
+    def __init__(self, engine: CourseRecommendationEngine, sections: Mapping[str, Any],
+                 slot_minutes: int = 5, candidate_limit: int = 40, time_budget: float = 0.2,
+                 node_budget: int = 200000, allow_unscheduled: bool = False) -> None:
+        self.engine = engine
+        self.slot_minutes = slot_minutes
+        self.candidate_limit = candidate_limit
+        self.time_budget = time_budget
+        self.node_budget = node_budget
+        self.allow_unscheduled = allow_unscheduled
+        self.sections: Dict[str, Tuple[Tuple[int, Any, Any], ...]] = {}
+        for code, entries in sections.items():
+            compiled = []
+            for entry in entries or ():
+                try:
+                    meetings = entry.get("meetings") or []
+                    mask = 0
+                    for meeting in meetings:
+                        mask |= _meeting_mask(meeting, slot_minutes)
+                    if all(mask != other[0] for other in compiled):  # same times, same choice
+                        compiled.append((mask, entry.get("section"), meetings))
+                except (AttributeError, KeyError, TypeError, ValueError) as e:
+                    logger.warning("Skipping malformed section of %s: %s", code, e)
+            if compiled:
+                self.sections[code] = tuple(compiled)
+
+    def schedule(self, student_data: Dict[str, Any], max_credits: int = 15,
+                 max_weekly_hours: Optional[float] = None, max_courses: Optional[int] = None) -> Dict[str, Any]:
+        started = time.monotonic()
+        budget = _SearchBudget(self.time_budget, self.node_budget)
+        engine = self.engine
+        profile = engine._normalize_student(student_data)
+        index = engine._index
+        catalog = index.catalog
+        hours_cap = profile.study_hours if max_weekly_hours is None else float(max_weekly_hours)
+        caps = (max_credits, hours_cap, max_courses if max_courses is not None else self.candidate_limit)
+
+        # Rank far enough down that candidate_limit distinct codes with sections survive.
+        keep = max(self.candidate_limit * 4, 1)
+        scored = heapq.nsmallest(keep, engine._score_candidates(profile, index, keep),
+                                 key=lambda x: (x[0], x[1], x[2]))
+        options: List[_SectionOption] = []
+        seen = set()
+        for t in scored:
+            code, i = t[1], t[2]
+            if code in seen:
+                continue
+            seen.add(code)
+            sections = self.sections.get(code)
+            if sections is None:
+                if not self.allow_unscheduled:
+                    continue
+                sections = ((0, None, []),)
+            c = catalog.courses[i]
+            options.append(_SectionOption(i, code, t[3], c.credits or 0, c.workload_hours, sections))
+            if len(options) >= self.candidate_limit:
+                break
+
+        best_value, best = self._search(options, caps, budget)
+        return {
+            "catalog_version": catalog.version,
+            "courses": [
+                {
+                    "course_id": catalog.courses[o.index].id,
+                    "course_code": o.code,
+                    "course_name": catalog.courses[o.index].name,
+                    "section": section[1],
+                    "meetings": section[2],
+                    "credits": o.credits,
+                    "workload_hours": o.hours,
+                    "confidence_score": round(o.value, 2),
+                }
+                for o, section in sorted(best, key=lambda item: (-item[0].value, item[0].code))
+            ],
+            "total_score": round(best_value, 2),
+            "credits": sum(o.credits for o, _ in best),
+            "workload_hours": sum(o.hours for o, _ in best),
+            "search": {
+                "complete": not budget.exhausted,
+                "nodes": budget.nodes,
+                "elapsed_ms": round((time.monotonic() - started) * 1000, 1),
+            },
+        }
+
+    @staticmethod
+    def _search(options: List[_SectionOption], caps: Tuple[int, float, int],
+                budget: _SearchBudget) -> Tuple[float, Tuple[Tuple[_SectionOption, Tuple], ...]]:
+        max_credits, max_hours, max_courses = caps
+        prefix = [0.0]
+        for o in options:
+            prefix.append(prefix[-1] + max(o.value, 0.0))
+        min_credits = min((o.credits for o in options if o.credits > 0), default=0)
+        min_hours = min((o.hours for o in options if o.hours > 0), default=0.0)
+        # value-per-unit orders for the fractional knapsack bounds on credits and hours
+        densities = [
+            (sorted(range(len(options)), key=lambda i: -options[i].value / max(options[i].credits, 1e-9)), "credits"),
+            (sorted(range(len(options)), key=lambda i: -options[i].value / max(options[i].hours, 1e-9)), "hours"),
+        ]
+
+        # greedy first fit seeds the incumbent so pruning starts immediately
+        best: Tuple[Tuple[_SectionOption, Tuple], ...] = ()
+        best_value, used, credits, hours = 0.0, 0, 0, 0.0
+        for o in options:
+            if len(best) >= max_courses or credits + o.credits > max_credits or hours + o.hours > max_hours:
+                continue
+            section = next((sec for sec in o.sections if not sec[0] & used), None)
+            if section is not None:
+                best += ((o, section),)
+                best_value += o.value
+                used |= section[0]
+                credits += o.credits
+                hours += o.hours
+
+        def slots_left(credits: int, hours: float, taken: int) -> int:
+            slots = max_courses - taken
+            if min_credits:
+                slots = min(slots, (max_credits - credits) // min_credits)
+            if min_hours:
+                slots = min(slots, int((max_hours - hours) // min_hours))
+            return max(slots, 0)
+
+        def fractional(start: int, room: Dict[str, float]) -> float:
+            bound = float("inf")
+            for order, field in densities:
+                left, total = room[field], 0.0
+                for i in order:
+                    if i < start or options[i].value <= 0:
+                        continue
+                    size = getattr(options[i], field)
+                    if size >= left:
+                        total += options[i].value * (left / size) if size > 0 else options[i].value
+                        break
+                    left -= size
+                    total += options[i].value
+                bound = min(bound, total)
+            return bound
+
+        def assign(courses: List[_SectionOption]) -> Optional[Tuple[Tuple[_SectionOption, Tuple], ...]]:
+            """A conflict-free section for every course, fewest-sections course first, or None."""
+            courses = sorted(courses, key=lambda o: len(o.sections))
+
+            def place(j: int, used: int) -> Optional[Tuple[Tuple[_SectionOption, Tuple], ...]]:
+                if j == len(courses):
+                    return ()
+                for section in courses[j].sections:
+                    if section[0] & used or not budget.spend():
+                        continue
+                    rest = place(j + 1, used | section[0])
+                    if rest is not None:
+                        return ((courses[j], section),) + rest
+                    if budget.exhausted:
+                        return None
+                return None
+
+            return place(0, 0)
+
+        def visit(start: int, value: float, used: int, credits: int, hours: float,
+                  chosen: Tuple[Tuple[_SectionOption, Tuple], ...]) -> None:
+            nonlocal best, best_value
+            if value > best_value:
+                best, best_value = chosen, value
+            k = slots_left(credits, hours, len(chosen))
+            room = {"credits": max_credits - credits, "hours": max_hours - hours}
+            for i in range(start, len(options)):
+                if k == 0 or value + prefix[min(i + k, len(options))] - prefix[i] <= best_value:
+                    return
+                if value + fractional(i, room) <= best_value:
+                    return
+                o = options[i]
+                if credits + o.credits > max_credits or hours + o.hours > max_hours:
+                    continue
+                if not budget.spend():
+                    return
+                # Section choice only matters for conflicts: keep the current
+                # assignment when a section of o fits it, re-assign otherwise.
+                section = next((sec for sec in o.sections if not sec[0] & used), None)
+                if section is not None:
+                    extended = chosen + ((o, section),)
+                else:
+                    extended = assign([c for c, _ in chosen] + [o])
+                    if extended is None:
+                        if budget.exhausted:
+                            return
+                        continue
+                mask = 0
+                for _, sec in extended:
+                    mask |= sec[0]
+                visit(i + 1, value + o.value, mask, credits + o.credits, hours + o.hours, extended)
+                if budget.exhausted:
+                    return
+
+        visit(0, 0.0, 0, 0, 0.0, ())
+        return best_value, best
+
+
+DEFAULT_SERVER_HOST = "127.0.0.1"
+DEFAULT_SERVER_PORT = 8765
+
+
+class _RecommendationRequestHandler(socketserver.StreamRequestHandler):
+    """JSON Lines protocol: one request object per line, one response per line.
+
+    A request is either a bare student object, answered with the bare
+    recommendation list exactly as ``cli_main`` prints it, or an envelope
+    ``{"student": {...}, "top_n": N}``, answered with
+    ``{"catalog_version": ..., "recommendations": [...]}``.  Failures are
+    answered with ``{"error": "..."}``.  When the engine has a metrics
+    registry, ``{"metrics": "json"}`` or ``{"metrics": "prometheus"}``
+    returns its current dump.  An envelope may also carry ``"fields"``, the
+    recommendation keys to return.
+    """
+
+    def handle(self) -> None:
+        for raw in self.rfile:
+            line = raw.strip()
+            if not line:
+                continue
+            response = self.server.answer(line)
+            text = self.server.serializer.dumps(response, self.server.engine.metrics)
+            self.wfile.write(text.encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class _ServerMixin:
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, address, engine: CourseRecommendationEngine,
+                 serializer: Optional[ResultSerializer] = None) -> None:
+        self.engine = engine
+        self.serializer = serializer or ResultSerializer()
+        super().__init__(address, _RecommendationRequestHandler)
+
+    def answer(self, line: bytes) -> Any:
+        try:
+            payload = json.loads(line)
+            if not isinstance(payload, dict):
+                return {"error": "Request must be a JSON object"}
+            if "metrics" in payload and len(payload) == 1:
+                return self.metrics_dump(payload["metrics"])
+            if "student" not in payload:
+                return self.engine.generate_recommendations(payload)
+            version, recs = self.engine.generate_versioned(payload.get("student") or {},
+                                                           top_n=payload.get("top_n", 15))
+            if payload.get("fields"):
+                recs = ResultSerializer(fields=payload["fields"], backend="json").select(recs)
+            return {"catalog_version": version, "recommendations": recs}
+        except Exception as e:
+            logger.exception("Failed to answer recommendation request")
+            return {"error": str(e)}
+
+
+    def metrics_dump(self, fmt: Any) -> Any:
+        return _metrics_response(self.engine, fmt)
+
+
+def _metrics_response(engine: CourseRecommendationEngine, fmt: Any) -> Any:
+    metrics = engine.metrics
+    if metrics is None:
+        return {"error": "Metrics are not enabled"}
+    if fmt == "prometheus":
+        return {"metrics": metrics.to_prometheus()}
+    return metrics.snapshot()
+
+
+class RecommendationTCPServer(_ServerMixin, socketserver.ThreadingTCPServer):
+    pass
+
+
+if hasattr(socketserver, "ThreadingUnixStreamServer"):
+    class RecommendationUnixServer(_ServerMixin, socketserver.ThreadingUnixStreamServer):
+        pass
+
+
+def make_server(engine: Optional[CourseRecommendationEngine] = None,
+                socket_path: Optional[str] = None,
+                host: str = DEFAULT_SERVER_HOST,
+                port: int = DEFAULT_SERVER_PORT,
+                serializer: Optional[ResultSerializer] = None):
+    """Build a server holding one warm engine; bind a Unix socket if a path is given."""
+    engine = engine or CourseRecommendationEngine()
+    if socket_path:
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+        return RecommendationUnixServer(socket_path, engine, serializer)
+    return RecommendationTCPServer((host, port), engine, serializer)
+
+
+class AsyncRecommendationService:
+    """asyncio front-end with single-flight coalescing and micro-batching.
+
+    Concurrent requests with the same cache key (profile, top_n, catalog
+    version, weights) share one computation.  Distinct requests go through
+    a queue of at most ``max_pending`` entries, so callers wait once it is
+    full; a collector drains it into batches of up to ``max_batch``, waiting
+    ``batch_window`` seconds for company, and scores each batch with
+    ``generate_recommendations_batch`` in a worker thread.  At most
+    ``max_concurrency`` batches run at once.  Speaks the same JSON Lines
+    protocol as ``make_server``.
+    """
+
+    def __init__(self, engine: CourseRecommendationEngine, max_concurrency: int = 2,
+                 batch_window: float = 0.002, max_batch: int = 64, max_pending: int = 1024,
+                 serializer: Optional[ResultSerializer] = None) -> None:
+        self.engine = engine
+        self.max_concurrency = max_concurrency
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.max_pending = max_pending
+        self.serializer = serializer or ResultSerializer()
+        self.coalesced = 0
+        self.batches = 0
+        self._inflight: Dict[Any, "asyncio.Future"] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._collector: Optional[asyncio.Task] = None
+        self._running: set = set()
+
+    async def start(self) -> None:
+        import asyncio
+
+        if self._collector is None:
+            self._queue = asyncio.Queue(self.max_pending)
+            self._slots = asyncio.Semaphore(self.max_concurrency)
+            self._collector = asyncio.get_running_loop().create_task(self._collect())
+
+    async def close(self) -> None:
+        import asyncio
+
+        if self._collector is not None:
+            self._collector.cancel()
+            await asyncio.gather(self._collector, *self._running, return_exceptions=True)
+            self._collector = None
+
+    async def recommend(self, student_data: Dict[str, Any], top_n: int = 15) -> List[Dict[str, Any]]:
+        return (await self.recommend_versioned(student_data, top_n))[1]
+
+    async def recommend_versioned(self, student_data: Dict[str, Any],
+                                  top_n: int = 15) -> Tuple[str, List[Dict[str, Any]]]:
+        """``recommend`` plus the version of the catalog the results came from."""
+        import asyncio
+
+        await self.start()
+        engine = self.engine
+        keep = max(1, int(top_n))
+        key = engine._cache_key(engine._normalize_student(student_data), keep)
+        if key is not None:
+            shared = self._inflight.get(key)
+            if shared is not None:
+                self.coalesced += 1
+                if engine.metrics is not None:
+                    engine.metrics.count("coalesced")
+                version, recs = await asyncio.shield(shared)
+                return version, RecommendationCache._copy(recs)
+            if engine.cache is not None:
+                cached = engine.cache.get(key)
+                if cached is not None:
+                    return key[0], cached
+
+        future = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._inflight[key] = future
+        queued = False
+        try:
+            await self._queue.put((student_data, keep, future))
+            queued = True
+            version, recs = await asyncio.shield(future)
+        finally:
+            if key is not None and self._inflight.get(key) is future:
+                del self._inflight[key]
+            if not queued:
+                future.cancel()  # releases callers coalesced onto a request that never ran
+        # key[0] is the version the key was built with; a reload may have landed since
+        if key is not None and engine.cache is not None and version == key[0]:
+            engine.cache.put(key, recs)
+        return version, RecommendationCache._copy(recs)
+
+    async def _collect(self) -> None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            if self.batch_window > 0 and self._queue.qsize() < self.max_batch - 1:
+                await asyncio.sleep(self.batch_window)
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._slots.acquire()
+            task = loop.create_task(self._run_batch(batch))
+            self._running.add(task)
+            task.add_done_callback(self._running.discard)
+
+    async def _run_batch(self, batch: List[Tuple[Dict[str, Any], int, "asyncio.Future"]]) -> None:
+        import asyncio
+
+        loop = asyncio.get_running_loop()
+        engine = self.engine
+        self.batches += 1
+        if engine.metrics is not None:
+            engine.metrics.count("microbatches")
+        try:
+            if engine.reranker is None:
+                # one pass at the widest top_n; every shorter list is a prefix of it
+                groups = {max(k for _, k, _ in batch): batch}
+            else:
+                # a reranked list is not a prefix of a longer one: one pass per top_n
+                groups = {}
+                for request in batch:
+                    groups.setdefault(request[1], []).append(request)
+            for keep, members in groups.items():
+                version, ranked = await loop.run_in_executor(None, engine.generate_versioned_batch,
+                                                             [student for student, _, _ in members], keep)
+                for (_, k, future), recs in zip(members, ranked):
+                    if not future.done():
+                        future.set_result((version, recs[:k]))
+        except Exception:
+            logger.exception("Micro-batch scoring failed; retrying requests one by one")
+            for student, k, future in batch:
+                if future.done():
+                    continue
+                try:
+                    future.set_result(await loop.run_in_executor(None, engine.generate_versioned, student, k))
+                except Exception as e:
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    async def answer(self, line: bytes) -> Any:
+        try:
+            payload = json.loads(line)
+            if not isinstance(payload, dict):
+                return {"error": "Request must be a JSON object"}
+            if "metrics" in payload and len(payload) == 1:
+                return _metrics_response(self.engine, payload["metrics"])
+            if "student" not in payload:
+                return await self.recommend(payload)
+            version, recs = await self.recommend_versioned(payload.get("student") or {},
+                                                           top_n=payload.get("top_n", 15))
+            if payload.get("fields"):
+                recs = ResultSerializer(fields=payload["fields"], backend="json").select(recs)
+            return {"catalog_version": version, "recommendations": recs}
+        except Exception as e:
+            logger.exception("Failed to answer recommendation request")
+            return {"error": str(e)}
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                raw = await reader.readline()
+                if not raw:
+                    break
+                line = raw.strip()
+                if not line:
+                    continue
+                response = await self.answer(line)
+                writer.write(self.serializer.dumps(response, self.engine.metrics).encode("utf-8") + b"\n")
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def start_server(self, socket_path: Optional[str] = None, host: str = DEFAULT_SERVER_HOST,
+                           port: int = DEFAULT_SERVER_PORT) -> "asyncio.AbstractServer":
+        import asyncio
+
+        await self.start()
+        if socket_path:
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+            return await asyncio.start_unix_server(self.handle_connection, socket_path)
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+
+async def _serve_async(args: argparse.Namespace, engine: CourseRecommendationEngine) -> None:
+    service = AsyncRecommendationService(engine, max_concurrency=args.max_concurrency,
+                                         batch_window=args.batch_window / 1000.0,
+                                         serializer=_make_serializer(args))
+    server = await service.start_server(socket_path=args.socket, host=args.host, port=args.port)
+    where = args.socket or "%s:%d" % server.sockets[0].getsockname()[:2]
+    logger.info("Async recommendation server listening on %s (catalog %s)", where, engine.catalog_version)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.close()
+
+
+def serve_main(args: argparse.Namespace) -> None:
+    cache = RecommendationCache(args.cache_size, args.cache_ttl) if args.cache_size > 0 else None
+    metrics = MetricsRegistry() if args.metrics else None
+    if args.asyncio:
+        import asyncio
+
+        engine = _make_engine(args, cache, metrics)
+        watcher = CatalogManager(engine, args.watch_interval) if args.watch_interval > 0 else None
+        if watcher is not None:
+            watcher.start()
+        try:
+            asyncio.run(_serve_async(args, engine))
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if watcher is not None:
+                watcher.stop()
+            _write_metrics(args, metrics)
+            if args.socket and os.path.exists(args.socket):
+                os.unlink(args.socket)
+        return
+
+    server = make_server(_make_engine(args, cache, metrics), socket_path=args.socket, host=args.host, port=args.port,
+                         serializer=_make_serializer(args))
+    watcher = CatalogManager(server.engine, args.watch_interval) if args.watch_interval > 0 else None
+    if watcher is not None:
+        watcher.start()
+    where = args.socket or "%s:%d" % server.server_address[:2]
+    logger.info("Recommendation server listening on %s (catalog %s)", where, server.engine.catalog_version)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if watcher is not None:
+            watcher.stop()
+        _write_metrics(args, metrics)
+        server.server_close()
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+
+def load_major_requirements(path: Path) -> Dict[str, List[str]]:
+    """Read ``{major: [course_code, ...]}`` for catalogs other than the built-in one."""
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if not isinstance(data, dict) or not all(
+            isinstance(codes, list) and all(isinstance(code, str) for code in codes) for codes in data.values()):
+        raise ValueError("Major requirements must map each major to a list of course codes")
+    return data
+
+
+def _make_engine(args: argparse.Namespace, cache: Optional[RecommendationCache] = None,
+                 metrics: Optional[MetricsRegistry] = None) -> CourseRecommendationEngine:
+    engine_class = VectorizedRecommendationEngine if getattr(args, "vectorized", False) else CourseRecommendationEngine
+    weights, collaborative = None, None
+    if getattr(args, "collaborative_weight", 0) > 0:
+        weights = dict(DEFAULT_WEIGHTS, collaborative=args.collaborative_weight)
+        collaborative = CollaborativeSignal()
+        collaborative.refresh()
+    reranker = None
+    if getattr(args, "diversity", None):
+        reranker = DiversityReranker(args.diversity, trade_off=args.diversity_trade_off,
+                                     department_quota=args.department_quota)
+    majors = load_major_requirements(args.majors) if getattr(args, "majors", None) else None
+    return engine_class(weights=weights, cache=cache, catalog_path=getattr(args, "catalog", None),
+                        snapshot_path=getattr(args, "snapshot", None),
+                        prerequisite_policy=getattr(args, "prerequisite_policy", "filter"),
+                        metrics=metrics, collaborative=collaborative, reranker=reranker,
+                        major_requirements=majors)
+
+
+def _make_serializer(args: argparse.Namespace) -> ResultSerializer:
+    def names(value: Optional[str]) -> List[str]:
+        return [name.strip() for name in (value or "").split(",") if name.strip()]
+
+    return ResultSerializer(fields=names(getattr(args, "fields", None)), omit=names(getattr(args, "omit", None)),
+                            backend=getattr(args, "json_backend", "auto"))
+
+
+def _write_metrics(args: argparse.Namespace, metrics: Optional[MetricsRegistry]) -> None:
+    if metrics is None or not getattr(args, "metrics", None):
+        return
+    text = metrics.to_json() + "\n" if args.metrics_format == "json" else metrics.to_prometheus()
+    with open(args.metrics, "w", encoding="utf-8") as f:
+        f.write(text)
+
+
+def _batch_results(engine: CourseRecommendationEngine, chunk: List[Any], top_n: int,
+                   detail: str = "full") -> Iterator[Dict[str, Any]]:
+    students = [r for r in chunk if isinstance(r, dict)]
+    try:
+        version, batch = engine.generate_versioned_batch(students, top_n, detail)
+        ranked = iter(batch)
+    except Exception:
+        logger.exception("Batch scoring failed; retrying students one by one")
+        ranked = None
+
+    for record in chunk:
+        if not isinstance(record, dict):
+            yield {"error": "Invalid student record: %s" % record}
+            continue
+        try:
+            if ranked is not None:
+                recs = next(ranked)
+            else:
+                version, recs = engine.generate_versioned(record, top_n, detail)
+            yield {"student_id": record.get("student_id"), "catalog_version": version,
+                   "recommendations": recs}
+        except Exception as e:
+            logger.exception("Failed to score student in batch")
+            yield {"student_id": record.get("student_id"), "error": str(e)}
+
+
+def _read_batch_records(source) -> Iterator[Any]:
+    """Parsed JSON Lines student records; an unparseable line yields its ValueError."""
+    for line in source:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise ValueError("Student record must be a JSON object")
+        except ValueError as e:
+            record = e
+        yield record
+
+
+def _stream_results(scorer: ParallelCohortScorer, records: Iterable[Any], top_n: int,
+                    detail: str = "full") -> Iterator[Dict[str, Any]]:
+    """``_batch_results`` for a process pool: one ``iter_recommendations_batch`` pass over
+    all of ``records``, so workers stay busy and results are written as chunks finish.
+
+    If the stream fails, the records it had taken but not answered go through
+    ``_batch_results`` in-process, with its per-record fallback, and streaming resumes
+    after them.
+    """
+    records = iter(records)
+    taken: deque = deque()
+
+    def students() -> Iterator[Dict[str, Any]]:
+        for record in records:
+            taken.append(record)
+            if isinstance(record, dict):
+                yield record
+
+    def invalid_records() -> Iterator[Dict[str, Any]]:
+        while taken and not isinstance(taken[0], dict):
+            yield {"error": "Invalid student record: %s" % taken.popleft()}
+
+    while True:
+        try:
+            for recs in scorer.iter_recommendations_batch(students(), top_n, detail):
+                yield from invalid_records()
+                record = taken.popleft()
+                yield {"student_id": record.get("student_id"), "catalog_version": scorer.catalog_version,
+                       "recommendations": recs}
+        except Exception:
+            if not taken:
+                raise
+            logger.exception("Pooled scoring failed; scoring the unanswered records in-process")
+            retry = list(taken)
+            taken.clear()
+            yield from _batch_results(scorer.engine, retry, top_n, detail)
+            continue
+        # only invalid records can follow the last scored student
+        yield from invalid_records()
+        return
+
+
+def batch_main(args: argparse.Namespace, chunk_size: int = 256) -> None:
+    """Read JSON Lines profiles and write one JSON Lines result per profile, in order."""
+    metrics = MetricsRegistry() if args.metrics else None
+    serializer = _make_serializer(args)
+    engine = _make_engine(args, metrics=metrics)
+    workers = getattr(args, "workers", 1)
+    if workers > 1:
+        engine = ParallelCohortScorer(engine, workers)
+    source = open(args.input_file, "r", encoding="utf-8") if args.input_file else sys.stdin
+    try:
+        records = _read_batch_records(source)
+        if isinstance(engine, ParallelCohortScorer):
+            serializer.write_lines(_stream_results(engine, records, args.top_n, args.detail), sys.stdout, metrics)
+        else:
+            chunk: List[Any] = []
+            for record in records:
+                chunk.append(record)
+                if len(chunk) >= chunk_size:
+                    serializer.write_lines(_batch_results(engine, chunk, args.top_n, args.detail),
+                                           sys.stdout, metrics)
+                    chunk = []
+            serializer.write_lines(_batch_results(engine, chunk, args.top_n, args.detail), sys.stdout, metrics)
+    finally:
+        if source is not sys.stdin:
+            source.close()
+        if isinstance(engine, ParallelCohortScorer):
+            engine.close()
+    sys.stdout.flush()
+    _write_metrics(args, metrics)
+
+
+def plan_main(args: argparse.Namespace) -> None:
+    try:
+        with open(args.input_file, "r", encoding="utf-8") as f:
+            student_data = json.load(f)
+        planner = DegreePlanner(_make_engine(args), time_budget=args.plan_time_budget)
+        plan = planner.plan(student_data, semesters=args.plan, max_credits=args.max_credits,
+                            max_weekly_hours=args.max_weekly_hours)
+        print(json.dumps(plan))
+    except Exception as e:
+        logger.exception("Fatal error in degree planner")
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+
+def schedule_main(args: argparse.Namespace) -> None:
+    try:
+        with open(args.input_file, "r", encoding="utf-8") as f:
+            student_data = json.load(f)
+        scheduler = SectionScheduler(_make_engine(args), load_sections(args.schedule),
+                                     time_budget=args.plan_time_budget)
+        result = scheduler.schedule(student_data, max_credits=args.max_credits,
+                                    max_weekly_hours=args.max_weekly_hours)
+        print(json.dumps(result))
+    except Exception as e:
+        logger.exception("Fatal error in section scheduler")
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+
+def _build_arg_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="SmartCourse recommendation engine")
+    parser.add_argument("input_file", nargs="?", help="JSON file with one student profile")
+    parser.add_argument("--batch", action="store_true",
+                        help="read JSON Lines profiles (input_file or stdin) and stream JSON Lines results")
+    parser.add_argument("--top-n", type=int, default=15, help="recommendations per student")
+    parser.add_argument("--detail", choices=DETAIL_LEVELS, default="full",
+                        help="result detail: ids-only, scores, or full with reasoning and factors")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="--batch worker processes (students are sharded across a process pool)")
+    parser.add_argument("--vectorized", action="store_true", help="use the NumPy scoring engine")
+    parser.add_argument("--prerequisite-policy", choices=("filter", "downrank"), default="filter",
+                        help="what to do with courses whose prerequisites are not in completed_courses")
+    parser.add_argument("--collaborative-weight", type=float, default=0.0,
+                        help="weight of the co-enrollment/rating factor read from logs/enrollments.log and "
+                             "logs/feedback.log (0 disables it)")
+    parser.add_argument("--diversity", choices=("mmr", "quota"),
+                        help="re-rank the top results so one department cannot dominate them")
+    parser.add_argument("--diversity-trade-off", type=float, default=0.7,
+                        help="--diversity mmr: 1.0 is pure relevance, 0.0 pure diversity")
+    parser.add_argument("--department-quota", type=int, default=2,
+                        help="--diversity quota: most courses taken per department")
+    parser.add_argument("--catalog", help="catalog JSON / JSON Lines path (default: backend/courses.json)")
+    parser.add_argument("--snapshot", help="catalog snapshot path (default: backend/catalog.snapshot)")
+    parser.add_argument("--majors", help="JSON file mapping each major to its required course codes "
+                                         "(default: the built-in requirements)")
+    parser.add_argument("--build-snapshot", action="store_true",
+                        help="compile the catalog into the binary snapshot and exit")
+    parser.add_argument("--plan", type=int, metavar="SEMESTERS",
+                        help="print a multi-semester degree plan for input_file instead of recommendations")
+    parser.add_argument("--schedule", metavar="SECTIONS_JSON",
+                        help="print the best conflict-free section bundle for input_file using these meeting times")
+    parser.add_argument("--max-credits", type=int, default=15, help="--plan/--schedule credit cap per term")
+    parser.add_argument("--max-weekly-hours", type=float,
+                        help="--plan/--schedule weekly workload cap (default: the student's study_hours)")
+    parser.add_argument("--plan-time-budget", type=float, default=0.5,
+                        help="--plan/--schedule search time budget in seconds")
+    parser.add_argument("--serve", action="store_true", help="run as a long-lived JSON Lines server")
+    parser.add_argument("--socket", help="Unix socket path for --serve (default: TCP)")
+    parser.add_argument("--host", default=DEFAULT_SERVER_HOST, help="TCP host for --serve")
+    parser.add_argument("--port", type=int, default=DEFAULT_SERVER_PORT, help="TCP port for --serve")
+    parser.add_argument("--cache-size", type=int, default=1024,
+                        help="--serve result cache entries (0 disables the cache)")
+    parser.add_argument("--cache-ttl", type=float, default=300.0, help="--serve result cache TTL in seconds")
+    parser.add_argument("--asyncio", action="store_true",
+                        help="--serve with the asyncio front-end (request coalescing and micro-batching)")
+    parser.add_argument("--max-concurrency", type=int, default=2, help="--asyncio batches scored at once")
+    parser.add_argument("--batch-window", type=float, default=2.0,
+                        help="--asyncio milliseconds to wait for a micro-batch to fill")
+    parser.add_argument("--watch-interval", type=float, default=5.0,
+                        help="--serve catalog file poll interval in seconds (0 disables hot reload)")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="enable per-stage timers and counters and write them to FILE on exit")
+    parser.add_argument("--metrics-format", choices=("prometheus", "json"), default="prometheus",
+                        help="--metrics output format")
+    parser.add_argument("--fields", help="comma-separated recommendation keys to output (default: all)")
+    parser.add_argument("--omit", help="comma-separated recommendation keys to drop, e.g. reasoning,factors")
+    parser.add_argument("--json-backend", choices=("auto", "orjson", "json"), default="auto",
+                        help="JSON encoder for results (auto uses orjson when installed)")
+    parser.add_argument("--log-file", help="engine log path (default: backend/logs/recommendation.log)")
+    parser.add_argument("--log-per-process", action="store_true",
+                        help="write one log file per process, suffixed with the pid")
+    return parser
 
 
 def cli_main() -> None:
+    args = _build_arg_parser().parse_args()
+    configure_logging(args.log_file, per_process=args.log_per_process)
+    if args.build_snapshot:
+        path = CourseRecommendationEngine(catalog_path=args.catalog, snapshot_path=args.snapshot).build_snapshot()
+        print(json.dumps({"snapshot": str(path)}))
+        return
+    if args.serve:
+        serve_main(args)
+        return
+    if args.batch:
+        batch_main(args)
+        return
+    if args.plan:
+        plan_main(args)
+        return
+    if args.schedule:
+        schedule_main(args)
+        return
+
     try:
-        if len(sys.argv) < 2:
+        if not args.input_file:
             print(json.dumps({"error": "Missing input file"}))
             sys.exit(1)
 
-        input_file = Path(sys.argv[1])
+        input_file = Path(args.input_file)
         if not input_file.exists():
             print(json.dumps({"error": "Input file not found"}))
             sys.exit(1)
@@ -645,10 +3820,12 @@ def cli_main() -> None:
         with open(input_file, "r", encoding="utf-8") as f:
             student_data = json.load(f)
 
-        engine = CourseRecommendationEngine()
-        recs = engine.generate_recommendations(student_data)
+        metrics = MetricsRegistry() if args.metrics else None
+        engine = _make_engine(args, metrics=metrics)
+        recs = engine.generate_recommendations(student_data, top_n=args.top_n, detail=args.detail)
         
-        print(json.dumps(recs))
+        print(_make_serializer(args).dumps(recs, metrics))
+        _write_metrics(args, metrics)
         sys.exit(0)
         
     except Exception as e:
@@ -29,3 +29,732 @@ def test_missing_fields_and_defaults():
     for r in recs:
         assert "course_code" in r
         assert 0.0 <= r["confidence_score"] <= 100.0
+
+
+def test_server_answers_json_lines():
+    import socket
+    import threading
+    from recommendation_algorithm import make_server
+
+    engine = CourseRecommendationEngine()
+    server = make_server(engine, port=0)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        with socket.create_connection(server.server_address[:2]) as conn:
+            stream = conn.makefile("rwb")
+            stream.write(b'{"student": {"major": "Business"}, "top_n": 2}\n')
+            stream.write(b'{"major": "Science"}\n')
+            stream.write(b'[1, 2]\n')
+            stream.flush()
+            envelope = json.loads(stream.readline())
+            bare = json.loads(stream.readline())
+            error = json.loads(stream.readline())
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    assert envelope == {
+        "catalog_version": engine.catalog_version,
+        "recommendations": engine.generate_recommendations({"major": "Business"}, top_n=2),
+    }
+    assert bare == engine.generate_recommendations({"major": "Science"})
+    assert "error" in error
+
+
+def test_batch_matches_single_calls():
+    engine = CourseRecommendationEngine()
+    students = [
+        {"student_id": "a", "major": "Business", "career_interests": ["Finance"]},
+        {"student_id": "b", "gpa": 2.1, "learning_style": "Reading", "study_hours": 4},
+        {"student_id": "c"},
+    ]
+    batch = engine.generate_recommendations_batch(students, top_n=4)
+    assert batch == [engine.generate_recommendations(s, top_n=4) for s in students]
+
+
+def test_vectorized_engine_matches_python_engine():
+    import pytest
+    pytest.importorskip("numpy")
+    from recommendation_algorithm import VectorizedRecommendationEngine
+
+    engine = CourseRecommendationEngine()
+    vectorized = VectorizedRecommendationEngine()
+    students = [
+        {"gpa": 3.6, "major": "Technology", "career_interests": ["IT", "AI", "IT"], "learning_style": "Hands-on"},
+        {"gpa": "n/a", "major": "Unknown", "learning_style": "Writing", "study_hours": 3},
+        {"gpa": 1.2, "major": "Creative Arts", "career_interests": ["Nothing"], "study_hours": 0},
+        {},
+    ]
+    for top_n in (1, 5, 50):
+        assert vectorized.generate_recommendations_batch(students, top_n) == \
+            engine.generate_recommendations_batch(students, top_n)
+    assert vectorized.score_students(students).shape == (4, len(engine.course_database))
+
+
+def test_reasoning_built_only_for_top_n():
+    engine = CourseRecommendationEngine()
+    calls = []
+    original = engine._generate_reasoning
+
+    def counting(*args):
+        calls.append(args[0]["code"])
+        return original(*args)
+
+    engine._generate_reasoning = counting
+    recs = engine.generate_recommendations({"major": "Science"}, top_n=4)
+    assert calls == [r["course_code"] for r in recs]
+    assert [r["confidence_score"] for r in recs] == sorted((r["confidence_score"] for r in recs), reverse=True)
+
+
+def test_compiled_catalog_is_frozen():
+    engine = CourseRecommendationEngine()
+    catalog = engine.catalog
+    assert len(catalog.courses) == len(engine.course_database)
+    assert catalog.major_requirements["Education"] == frozenset({"ENG101", "PSYCH101", "INT023"})
+    phys = next(c for c in catalog.courses if c.code == "PHYS101")
+    assert phys.career_relevance >= {"Engineering", "Science"}
+    assert catalog.learning_scores["Writing"][catalog.courses.index(phys)] == 0.35
+    try:
+        catalog.major_requirements["Education"] = frozenset()
+    except TypeError:
+        pass
+    else:
+        raise AssertionError("compiled catalog should be read-only")
+
+
+def test_course_records_validate_and_skip_malformed():
+    from recommendation_algorithm import CourseRecord
+
+    records = CourseRecommendationEngine._build_records([
+        {"id": 1, "code": "A1", "credits": "3", "difficulty": 2, "career_relevance": ["IT"], "learning_style": ["Visual"]},
+        {"id": 2, "code": "B2", "difficulty": "hard"},
+        {"id": 3, "code": "C3", "career_relevance": "IT"},
+        {"id": 4, "code": "D4", "prerequisites": 5},
+    ])
+    assert [r.code for r in records] == ["A1"]
+    record = records[0]
+    assert isinstance(record, CourseRecord)
+    assert record.credits == 3 and record.workload_hours == 8.0
+    assert record.get("code") == record["code"] == "A1"
+    assert record.get("missing", "x") == "x"
+    assert not hasattr(record, "__dict__")
+
+
+def test_result_cache_hits_evicts_and_invalidates():
+    from recommendation_algorithm import RecommendationCache
+
+    cache = RecommendationCache(maxsize=2, ttl=None)
+    engine = CourseRecommendationEngine(cache=cache)
+    student = {"major": "Education", "career_interests": ["Law", "Education"]}
+    reordered = {"major": "Education", "career_interests": ["Education", "Law"]}
+
+    first = engine.generate_recommendations(student, top_n=3)
+    first[0]["course_code"] = "mutated"
+    second = engine.generate_recommendations(reordered, top_n=3)
+    assert second == CourseRecommendationEngine().generate_recommendations(student, top_n=3)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    engine.generate_recommendations({"major": "Science"}, top_n=3)
+    engine.generate_recommendations({"major": "Business"}, top_n=3)
+    assert cache.stats()["size"] == 2 and cache.evictions == 1
+
+    cache.invalidate()
+    assert cache.stats()["size"] == 0
+
+
+def test_catalog_manager_hot_swaps_on_file_change(tmp_path):
+    from recommendation_algorithm import CatalogManager, RecommendationCache
+
+    path = tmp_path / "courses.json"
+    path.write_text(json.dumps([{"id": 1, "code": "OLD1", "name": "Old"}]), encoding="utf-8")
+    engine = CourseRecommendationEngine(cache=RecommendationCache(), catalog_path=path)
+    manager = CatalogManager(engine)
+    old_version = engine.catalog_version
+    assert engine.generate_recommendations({})[0]["course_code"] == "OLD1"
+    assert not manager.check()
+
+    path.write_text(json.dumps([{"id": 2, "code": "NEW2", "name": "New course"}]), encoding="utf-8")
+    assert manager.check()
+    assert engine.catalog_version != old_version
+    assert engine.generate_recommendations({})[0]["course_code"] == "NEW2"
+
+    path.write_text("[{broken", encoding="utf-8")
+    assert not manager.check()
+    assert engine.generate_recommendations({})[0]["course_code"] == "NEW2"
+
+
+def test_stream_course_records_json_lines_and_arrays(tmp_path):
+    import io
+    import pytest
+    from recommendation_algorithm import _iter_json_array, stream_course_records
+
+    lines = tmp_path / "courses.jsonl"
+    lines.write_text(
+        '{"id": 1, "code": "A1", "difficulty": 2}\n'
+        '{"id": 2, "code": \n'
+        '\n'
+        '{"id": 3, "code": "C3", "workload_hours": "lots"}\n'
+        '{"id": 4, "code": "D4"}\n',
+        encoding="utf-8",
+    )
+    errors = []
+    records = list(stream_course_records(lines, errors))
+    assert [r.code for r in records] == ["A1", "D4"]
+    assert [row for row, _ in errors] == [2, 4]
+
+    array = json.dumps([{"code": "X%d" % i, "career_relevance": ["a, ]"]} for i in range(20)])
+    assert list(_iter_json_array(io.StringIO(array), chunk_size=5)) == json.loads(array)
+
+    numbers = '[0.1, -12.5e-3, 7, 1E2, "x\\u00e9"]'
+    malformed = '[{"code": "A1"}, {"code": tru}, ' + ", ".join(['{"code": "Z9"}'] * 1000) + "]"
+    for chunk_size in (1, 2, 3):
+        assert list(_iter_json_array(io.StringIO(numbers), chunk_size)) == json.loads(numbers)
+        f = io.StringIO(malformed)
+        with pytest.raises(ValueError):
+            list(_iter_json_array(f, chunk_size))
+        assert f.tell() < 50  # raised at the bad element, not after buffering the rest
+
+    engine = CourseRecommendationEngine(catalog_path=lines)
+    assert [c.code for c in engine.course_database] == ["A1", "D4"]
+
+
+def test_snapshot_round_trip_and_staleness(tmp_path, monkeypatch):
+    catalog_path = tmp_path / "courses.json"
+    snapshot_path = tmp_path / "catalog.snapshot"
+    courses = [{"id": i, "code": "C%d" % i, "career_relevance": ["IT"], "learning_style": ["Visual"]} for i in range(5)]
+    catalog_path.write_text(json.dumps(courses), encoding="utf-8")
+
+    compiled = CourseRecommendationEngine(catalog_path=catalog_path, snapshot_path=snapshot_path)
+    compiled.build_snapshot()
+    loaded = CourseRecommendationEngine(catalog_path=catalog_path, snapshot_path=snapshot_path)
+    student = {"career_interests": ["IT"], "learning_style": "Reading"}
+    assert loaded.catalog_version == compiled.catalog_version
+    assert loaded.generate_recommendations(student) == compiled.generate_recommendations(student)
+
+    # learning scores are precomputed into the snapshot, so the style table is part of its key
+    import recommendation_algorithm
+    monkeypatch.setitem(recommendation_algorithm.LEARNING_STYLE_COMPATIBILITY, "Reading", ["Visual"])
+    retuned = CourseRecommendationEngine(catalog_path=catalog_path, snapshot_path=snapshot_path)
+    assert retuned.generate_recommendations(student)[0]["factors"]["learning"] == 0.75
+    monkeypatch.undo()
+
+    catalog_path.write_text(json.dumps(courses[:2]), encoding="utf-8")
+    stale = CourseRecommendationEngine(catalog_path=catalog_path, snapshot_path=snapshot_path)
+    assert [c.code for c in stale.course_database] == ["C0", "C1"]
+
+
+def test_prerequisites_filter_and_downrank():
+    from recommendation_algorithm import PrerequisiteGraph, CourseRecord
+
+    engine = CourseRecommendationEngine()
+    student = {"major": "Technology", "career_interests": ["Robotics", "AI"], "completed_courses": []}
+    codes = [r["course_code"] for r in engine.generate_recommendations(student, top_n=40)]
+    assert "INT010" not in codes and "INT013" not in codes
+
+    student["completed_courses"] = ["CS101"]
+    recs = engine.generate_recommendations(student, top_n=40)
+    codes = [r["course_code"] for r in recs]
+    assert "CS101" not in codes and "INT010" in codes
+    assert all(r["prerequisites_met"] for r in recs)
+
+    downrank = CourseRecommendationEngine(prerequisite_policy="downrank")
+    recs = downrank.generate_recommendations({"major": "Science", "completed_courses": []}, top_n=40)
+    phys = next(r for r in recs if r["course_code"] == "PHYS101")
+    assert phys["prerequisites_met"] is False
+
+    graph = PrerequisiteGraph(tuple(CourseRecord.from_dict(c) for c in [
+        {"code": "A"}, {"code": "B", "prerequisites": ["A"]}, {"code": "C", "prerequisites": ["B"]},
+        {"code": "X", "prerequisites": ["Y"]}, {"code": "Y", "prerequisites": ["X"]},
+    ]))
+    assert graph.order.index("A") < graph.order.index("B") < graph.order.index("C")
+    assert graph.cyclic == {"X", "Y"}
+    assert graph.closure["C"] == graph.bits["A"] | graph.bits["B"]
+    assert graph.is_eligible(2, graph.completed_mask(["B"]))
+    assert not graph.is_eligible(2, graph.completed_mask(["A"]))
+
+
+def test_degree_planner_respects_caps_prerequisites_and_budget():
+    from recommendation_algorithm import DegreePlanner
+
+    engine = CourseRecommendationEngine()
+    student = {"major": "Technology", "career_interests": ["AI", "Robotics"], "study_hours": 30,
+               "completed_courses": ["ENG101"]}
+    plan = DegreePlanner(engine).plan(student, semesters=3, max_credits=9)
+    assert plan["search"]["complete"]
+    assert len(plan["semesters"]) == 3
+
+    seen = {"ENG101"}
+    prerequisites = {c.code: c.prerequisites for c in engine.course_database}
+    for term in plan["semesters"]:
+        assert term["credits"] <= 9 and term["workload_hours"] <= 30
+        codes = [c["course_code"] for c in term["courses"]]
+        assert all(set(prerequisites[code]) <= seen for code in codes)
+        seen.update(codes)
+    assert "ENG101" not in [c["course_code"] for t in plan["semesters"] for c in t["courses"]]
+
+    for node_budget in (1, 2, 5):
+        rushed = DegreePlanner(engine, node_budget=node_budget).plan(student, semesters=3, max_credits=9)
+        assert not rushed["search"]["complete"]
+        assert len(rushed["semesters"]) == 3
+        assert all(term["courses"] and term["credits"] > 6 for term in rushed["semesters"])
+
+
+def test_benchmark_harness_reports_and_flags_regressions(tmp_path):
+    import benchmark_recommendations as bench
+
+    catalog = bench.generate_catalog(50, seed=1)
+    assert catalog == bench.generate_catalog(50, seed=1)
+    assert len({c["code"] for c in catalog}) == 50
+    majors = bench.generate_major_requirements(catalog, seed=1)
+    assert set(majors) == set(bench.MAJORS)
+    assert all(codes and set(codes) <= {c["code"] for c in catalog} for codes in majors.values())
+    path = tmp_path / "catalog.json"
+    path.write_text(json.dumps(catalog), encoding="utf-8")
+    engine = CourseRecommendationEngine(catalog_path=path, snapshot_path=tmp_path / "catalog.snapshot",
+                                        major_requirements=majors)
+    student = {"major": bench.MAJORS[0]}
+    assert any(r["is_major_requirement"] for r in engine.generate_recommendations(student, top_n=50))
+    report = bench.run([50], student_count=5, include_cli=False)
+    python = report["catalogs"]["50"]["python"]
+    assert python["single"]["p50_ms"] <= python["single"]["p99_ms"]
+    assert python["batch"]["students"] == 5
+
+    slower = json.loads(json.dumps(report))
+    slower["catalogs"]["50"]["python"]["single"]["p50_ms"] *= 10
+    assert bench.find_regressions(slower, report, 0.2) == ["50.python.single.p50_ms: %s -> %s" % (
+        python["single"]["p50_ms"], slower["catalogs"]["50"]["python"]["single"]["p50_ms"])]
+    assert bench.find_regressions(report, report, 0.2) == []
+
+
+def test_metrics_registry_times_stages_and_counts():
+    from recommendation_algorithm import MetricsRegistry, RecommendationCache
+
+    seen = []
+    metrics = MetricsRegistry()
+    metrics.add_hook(lambda kind, name, value: seen.append((kind, name)))
+    engine = CourseRecommendationEngine(cache=RecommendationCache(), metrics=metrics)
+    student = {"major": "Technology", "career_interests": ["AI"]}
+    first = engine.generate_recommendations(student, top_n=3)
+    assert engine.generate_recommendations(student, top_n=3) == first
+    assert first == CourseRecommendationEngine().generate_recommendations(student, top_n=3)
+
+    data = metrics.snapshot()
+    assert 0 < data["counters"].pop("courses_scored") <= len(engine.course_database)
+    assert data["counters"] == {"requests": 2, "cache_misses": 1, "cache_hits": 1}
+    assert data["timers"]["normalize"]["count"] == 2
+    assert all(data["timers"][stage]["count"] == 1 for stage in ("score", "select", "reasoning"))
+    assert ("counter", "cache_hits") in seen and ("timer", "score") in seen
+
+    text = metrics.to_prometheus()
+    assert 'smartcourse_stage_seconds_count{stage="score"} 1' in text
+    assert "smartcourse_cache_hits_total 1" in text
+    assert json.loads(metrics.to_json()) == metrics.snapshot()
+
+
+def test_logging_is_configured_explicitly_and_queued(tmp_path):
+    import logging
+    import recommendation_algorithm as ra
+
+    root = logging.getLogger()
+    handlers = list(root.handlers)
+    assert not any(getattr(h, "baseFilename", None) == str(ra.LOG_FILE) for h in handlers)
+
+    listener = ra.configure_logging(tmp_path / "logs" / "engine.log", per_process=True)
+    try:
+        assert ra.configure_logging() is listener
+        ra.logger.info("queued record")
+    finally:
+        ra.stop_logging()
+    assert root.handlers == handlers
+    (log_file,) = (tmp_path / "logs").iterdir()
+    assert log_file.name.startswith("engine.") and log_file.suffix == ".log"
+    assert "INFO queued record" in log_file.read_text(encoding="utf-8")
+
+
+def test_parallel_cohort_scorer_preserves_order():
+    from recommendation_algorithm import ParallelCohortScorer
+
+    engine = CourseRecommendationEngine(weights={"career": 0.6, "major": 0.1, "difficulty": 0.1,
+                                                 "workload": 0.1, "learning": 0.1})
+    students = [
+        {"student_id": i, "major": major, "career_interests": [career], "gpa": 2.0 + i % 3,
+         "completed_courses": ["ENG101"] if i % 2 else None}
+        for i, (major, career) in enumerate([("Technology", "AI"), ("Business", "Finance"),
+                                             ("Science", "Research"), ("Creative Arts", "Design")] * 5)
+    ]
+    with ParallelCohortScorer(engine, workers=2, chunk_size=3, max_pending=2) as scorer:
+        assert scorer.generate_recommendations_batch(students, top_n=4) == \
+            engine.generate_recommendations_batch(students, top_n=4)
+
+        # batch mode streams the whole input through the pool; a failing chunk falls back per record
+        from recommendation_algorithm import _stream_results
+        records = [ValueError("bad line")] + students[:7] + [{"student_id": "x", "career_interests": 5}] \
+            + students[7:] + [ValueError("trailing")]
+        read = []
+
+        def source():
+            for record in records:
+                read.append(record)
+                yield record
+
+        results = _stream_results(scorer, source(), 4)
+        assert next(results) == {"error": "Invalid student record: bad line"}
+        assert next(results)["recommendations"] == engine.generate_recommendations(students[0], top_n=4)
+        assert len(read) < len(records)
+        results = list(results)
+        assert [r.get("student_id") for r in results] == [s["student_id"] for s in students[1:7]] + ["x"] \
+            + [s["student_id"] for s in students[7:]] + [None]
+        assert "error" in results[6] and results[-1] == {"error": "Invalid student record: trailing"}
+        assert [r["recommendations"] for r in results[:6] + results[7:-1]] == \
+            engine.generate_recommendations_batch(students[1:], top_n=4)
+
+
+def test_cohort_factors_rerank_matches_fresh_engine():
+    import pytest
+    pytest.importorskip("numpy")
+    from recommendation_algorithm import VectorizedRecommendationEngine
+
+    students = [
+        {"major": "Technology", "career_interests": ["AI", "Robotics"], "gpa": 3.6},
+        {"major": "Creative Arts", "career_interests": ["Design"], "learning_style": "Hands-on",
+         "completed_courses": ["ART101"]},
+        {"major": "Business", "study_hours": 4},
+    ]
+    tuned = {"career": 0.2, "major": 0.4, "difficulty": 0.1, "workload": 0.2, "learning": 0.1}
+    engine = VectorizedRecommendationEngine()
+    cohort = engine.factorize_cohort(students)
+
+    assert cohort.rank(top_n=5) == engine.generate_recommendations_batch(students, top_n=5)
+    assert cohort.rank(tuned, top_n=5) == \
+        CourseRecommendationEngine(weights=tuned).generate_recommendations_batch(students, top_n=5)
+
+    ab = cohort.compare(None, tuned, top_n=5)
+    assert ab["b"] == cohort.rank(tuned, top_n=5)
+    assert ab["summary"]["students"] == 3 and 0.0 <= ab["summary"]["mean_overlap"] <= 1.0
+    assert cohort.compare(tuned, tuned)["summary"]["lists_changed"] == 0
+
+
+def test_candidate_pruning_matches_full_scan(tmp_path):
+    import heapq
+    import benchmark_recommendations as bench
+
+    catalog = bench.generate_catalog(400, seed=7)
+    catalog.append(dict(catalog[0], id=999))  # duplicate code
+    (tmp_path / "courses.json").write_text(json.dumps(catalog), encoding="utf-8")
+    students = bench.generate_students(30, seed=7)
+    students[0]["career_interests"] = []
+    students[1]["learning_style"] = ""
+    students[2]["completed_courses"] = ["SYN00000", "SYN00011"]
+
+    for policy in ("filter", "downrank"):
+        engine = CourseRecommendationEngine(catalog_path=tmp_path / "courses.json",
+                                            snapshot_path=tmp_path / "catalog.snapshot",
+                                            prerequisite_policy=policy)
+        for student in students:
+            profile = engine._normalize_student(student)
+            full = heapq.nsmallest(10, engine._score_catalog(profile, engine.catalog),
+                                   key=lambda x: (x[0], x[1], x[2]))
+            pruned = engine._score_candidates(profile, engine._index, 10)
+            assert heapq.nsmallest(10, pruned, key=lambda x: (x[0], x[1], x[2])) == full
+            assert len(pruned) < len(catalog)
+
+
+def test_result_serializer_selects_fields_and_backends_agree():
+    import io
+    from recommendation_algorithm import ResultSerializer, orjson
+
+    recs = CourseRecommendationEngine().generate_recommendations({"major": "Business"}, top_n=3)
+    plain = ResultSerializer(backend="json")
+    assert plain.dumps(recs) == json.dumps(recs)
+    if orjson is not None:
+        assert json.loads(ResultSerializer(backend="orjson").dumps(recs)) == recs
+        assert json.loads(ResultSerializer(backend="orjson").dumps([2 ** 70])) == [2 ** 70]
+
+    lean = ResultSerializer(omit=["reasoning", "factors"], backend="json")
+    assert all("reasoning" not in r and "factors" not in r for r in json.loads(lean.dumps(recs)))
+    ids = ResultSerializer(fields=["course_code", "confidence_score"], backend="json")
+    envelope = {"student_id": 7, "recommendations": recs}
+    assert json.loads(ids.dumps(envelope)) == {
+        "student_id": 7,
+        "recommendations": [{"course_code": r["course_code"], "confidence_score": r["confidence_score"]}
+                            for r in recs],
+    }
+    assert envelope["recommendations"] is recs and "reasoning" in recs[0]
+
+    out = io.StringIO()
+    ids.write_lines([envelope, {"error": "bad"}], out)
+    assert [json.loads(line) for line in out.getvalue().splitlines()][1] == {"error": "bad"}
+
+
+def test_reasoning_templates_are_memoized_and_localizable():
+    from recommendation_algorithm import ReasoningTemplates
+
+    engine = CourseRecommendationEngine()
+    first = engine.generate_recommendations({"major": "Technology", "career_interests": ["AI"]})
+    again = engine.generate_recommendations({"major": "Technology", "career_interests": ["AI"]})
+    assert all(a["reasoning"] is b["reasoning"] for a, b in zip(first, again))
+    assert first[0]["reasoning"].startswith("Required for Technology major")
+
+    templates = ReasoningTemplates(phrases={"major": "Obligatorio para {major}",
+                                            "default": "Requisito general"}, separator=" | ")
+    spanish = CourseRecommendationEngine(reasoning_templates=templates)
+    recs = spanish.generate_recommendations({"major": "Technology", "career_interests": ["AI"]})
+    assert [r["course_code"] for r in recs] == [r["course_code"] for r in first]
+    assert recs[0]["reasoning"].split(" | ")[0] == "Obligatorio para Technology"
+    assert templates.render_key((None, 0, False, 1, 1, False)) == "Requisito general"
+
+
+def test_async_service_coalesces_and_micro_batches():
+    import asyncio
+    from recommendation_algorithm import AsyncRecommendationService
+
+    engine = CourseRecommendationEngine()
+    students = [{"major": major, "career_interests": ["AI"]} for major in ("Technology", "Business", "Science")]
+
+    async def scenario():
+        service = AsyncRecommendationService(engine, max_concurrency=1, batch_window=0.01, max_pending=2)
+        try:
+            same = [service.recommend(students[0], top_n=5) for _ in range(10)]
+            distinct = [service.recommend(s, top_n=n) for s, n in zip(students, (3, 4, 5))]
+            results = await asyncio.gather(*same, *distinct)
+
+            server = await service.start_server(port=0)
+            async with server:
+                reader, writer = await asyncio.open_connection(*server.sockets[0].getsockname()[:2])
+                writer.write(b'{"student": {"major": "Science"}, "top_n": 2, "fields": ["course_code"]}\n')
+                await writer.drain()
+                envelope = json.loads(await reader.readline())
+                writer.close()
+            return service, results, envelope
+        finally:
+            await service.close()
+
+    service, results, envelope = asyncio.run(scenario())
+    assert results[:10] == [engine.generate_recommendations(students[0], top_n=5)] * 10
+    assert results[10:] == [engine.generate_recommendations(s, top_n=n) for s, n in zip(students, (3, 4, 5))]
+    assert service.coalesced == 9
+    assert service.batches < 4
+    assert envelope["recommendations"] == [
+        {"course_code": r["course_code"]} for r in engine.generate_recommendations({"major": "Science"}, top_n=2)
+    ]
+
+
+def test_collaborative_signal_reads_logs_incrementally(tmp_path):
+    import heapq
+    from recommendation_algorithm import CollaborativeSignal, DEFAULT_WEIGHTS
+
+    enrollments, feedback = tmp_path / "enrollments.log", tmp_path / "feedback.log"
+    enrollments.write_text("".join(
+        "2025-01-0%d 10:00:00 | ENROLL | student_id=%d | course_id=%d | semester=Fall\n" % (s, s, c)
+        for s, c in [(1, 1), (1, 20), (2, 1), (2, 20), (3, 1), (3, 5)]
+    ), encoding="utf-8")
+    feedback.write_text(json.dumps({"student_id": 4, "course_id": 20, "rating": 5, "comments": ""}) + "\n"
+                        + "not json\n", encoding="utf-8")
+
+    signal = CollaborativeSignal()
+    assert signal.refresh(enrollments, feedback) == 1
+    assert signal.refresh(enrollments, feedback) == 1  # nothing new, no recompaction
+    scores, floor = signal.score({"1"})
+    assert scores["20"] > scores["5"] > floor
+    # a rated course outside the history's neighbors keeps its rating-only score
+    assert "20" not in signal.score({"5"})[0] and signal.rating_scores()["20"] > floor
+    assert signal.history(3) == {"1", "5"}
+
+    with open(enrollments, "a", encoding="utf-8") as f:
+        f.write("2025-01-09 10:00:00 | ENROLL | student_id=9 | course_id=5 | sem")  # still being written
+    signal.refresh(enrollments, feedback)
+    assert "9" not in signal._histories
+    with open(enrollments, "a", encoding="utf-8") as f:
+        f.write("ester=Fall\n")
+    assert signal.refresh(enrollments, feedback) == 2 and signal.history(9) == {"5"}
+
+    weights = dict(DEFAULT_WEIGHTS, collaborative=0.2)
+    engine = CourseRecommendationEngine(weights=weights, collaborative=signal)
+    student = {"student_id": 3, "major": "Undecided", "career_interests": ["AI"]}
+    recs = engine.generate_recommendations(student, top_n=10)
+    profile = engine._normalize_student(student)
+    full = heapq.nsmallest(10, engine._score_catalog(profile, engine.catalog,
+                                                     collab=engine._collaborative_rows(profile, engine._index)),
+                           key=lambda x: (x[0], x[1], x[2]))
+    assert [r["course_code"] for r in recs] == [t[1] for t in full]
+    assert recs != CourseRecommendationEngine().generate_recommendations(student, top_n=10)
+    for r in recs:
+        assert r["factors"]["collaborative"] == round(next(t[10] for t in full if t[1] == r["course_code"]), 2)
+        assert abs(sum(r["contributions"].values()) - r["confidence_score"]) < 0.05
+
+    try:
+        from recommendation_algorithm import VectorizedRecommendationEngine
+        vectorized = VectorizedRecommendationEngine(weights=weights, collaborative=signal)
+    except ImportError:
+        return
+    assert vectorized.generate_recommendations(student, top_n=10) == recs
+
+
+def test_section_scheduler_avoids_conflicts_within_caps():
+    from recommendation_algorithm import SectionScheduler, _meeting_mask
+
+    engine = CourseRecommendationEngine()
+    student = {"major": "Technology", "career_interests": ["AI", "Robotics"], "study_hours": 25,
+               "completed_courses": ["ENG101"]}
+    codes = [r["course_code"] for r in engine.generate_recommendations(student, 6)]
+    sections = {
+        code: [{"section": str(k), "meetings": [{"days": "MWF" if k % 2 else "TR",
+                                                  "start": "%02d:00" % (9 + k), "end": "%02d:50" % (9 + k)}]}
+               for k in range(3)]
+        for code in codes
+    }
+    sections[codes[0]].append({"section": "bad", "meetings": [{"days": "X", "start": "9", "end": "8"}]})
+    result = SectionScheduler(engine, sections).schedule(student, max_credits=12)
+    assert result["search"]["complete"]
+    assert result["credits"] <= 12 and result["workload_hours"] <= 25
+    assert result["courses"] and all(c["course_code"] in codes for c in result["courses"])
+    used = 0
+    for course in result["courses"]:
+        mask = 0
+        for meeting in course["meetings"]:
+            mask |= _meeting_mask(meeting, 5)
+        assert not mask & used
+        used |= mask
+    assert _meeting_mask({"days": "M", "start": "09:00", "end": "09:30"}, 5) & \
+        _meeting_mask({"days": ["Mon"], "start": "09:25", "end": "10:00"}, 5)
+
+
+def test_diversity_reranker_spreads_departments():
+    from recommendation_algorithm import DiversityReranker, RecommendationCache
+
+    student = {"major": "Creative Arts", "career_interests": ["Designer", "Artist"],
+               "learning_style": "visual", "study_hours": 10}
+    plain = CourseRecommendationEngine().generate_recommendations(student, 6)
+    assert sum(r["department"] == "Creative" for r in plain) >= 4
+
+    neutral = CourseRecommendationEngine(reranker=DiversityReranker(trade_off=1.0))
+    assert neutral.generate_recommendations(student, 6) == plain
+
+    for reranker in (DiversityReranker(), DiversityReranker("quota", department_quota=2)):
+        engine = CourseRecommendationEngine(reranker=reranker, cache=RecommendationCache())
+        recs = engine.generate_recommendations(student, 6)
+        assert len(recs) == 6 and recs[0] == plain[0]
+        assert sum(r["department"] == "Creative" for r in recs) <= 2
+        assert engine.generate_recommendations(student, 6) == recs
+
+
+def test_detail_levels_skip_reasoning_and_factors():
+    import pytest
+    from recommendation_algorithm import DEFAULT_WEIGHTS
+
+    engine = CourseRecommendationEngine()
+    student = {"major": "Technology", "career_interests": ["AI"], "learning_style": "Visual"}
+    full = engine.generate_recommendations(student, top_n=5)
+    assert set(full[0]["factors"]) == set(DEFAULT_WEIGHTS) == set(full[0]["contributions"])
+    assert all(abs(sum(r["contributions"].values()) - r["confidence_score"]) < 0.05 for r in full)
+
+    scores = engine.generate_recommendations(student, top_n=5, detail="scores")
+    assert scores == [{k: r[k] for k in ("course_id", "course_code", "confidence_score")} for r in full]
+    ids = engine.generate_recommendations_batch([student], top_n=5, detail="ids-only")
+    assert ids == [[{"course_id": r["course_id"], "course_code": r["course_code"]} for r in full]]
+    with pytest.raises(ValueError):
+        engine.generate_recommendations(student, detail="everything")
+
+
+def test_import_does_not_load_optional_heavy_modules():
+    import subprocess
+    import sys
+    from pathlib import Path
+
+    code = ("import sys, recommendation_algorithm; "
+            "print(sorted(m for m in ('numpy', 'asyncio', 'concurrent.futures') if m in sys.modules))")
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                         cwd=str(Path(__file__).resolve().parent))
+    assert out.stdout.strip() == "[]"
+
+
+def test_catalog_version_comes_from_the_catalog_that_ranked(tmp_path):
+    from recommendation_algorithm import RecommendationCache, make_server
+
+    path = tmp_path / "courses.json"
+    path.write_text(json.dumps([{"id": 1, "code": "OLD1", "name": "Old"}]), encoding="utf-8")
+    engine = CourseRecommendationEngine(cache=RecommendationCache(), catalog_path=path)
+    old_version = engine.catalog_version
+    normalize = engine._normalize_student
+
+    def reload_then_normalize(student_data):
+        if engine.catalog_version == old_version:  # a reload lands mid-request
+            path.write_text(json.dumps([{"id": 2, "code": "NEW2", "name": "New"}]), encoding="utf-8")
+            engine.reload_catalog()
+        return normalize(student_data)
+
+    engine._normalize_student = reload_then_normalize
+    server = make_server(engine, socket_path=str(tmp_path / "s.sock"))
+    try:
+        answer = server.answer(json.dumps({"student": {"major": "Science"}, "top_n": 1}).encode())
+    finally:
+        server.server_close()
+    assert answer["recommendations"][0]["course_code"] == "NEW2"
+    assert answer["catalog_version"] == engine.catalog_version != old_version
+    version, recs = engine.generate_versioned({"major": "Science"}, top_n=1)
+    assert version == answer["catalog_version"] and recs == answer["recommendations"]
+
+
+def test_parallel_workers_write_their_own_log_files(tmp_path):
+    import os
+    import recommendation_algorithm as ra
+    from recommendation_algorithm import ParallelCohortScorer
+
+    ra.configure_logging(tmp_path / "engine.log", per_process=True)
+    try:
+        with ParallelCohortScorer(CourseRecommendationEngine(), workers=2, chunk_size=1) as scorer:
+            scorer.generate_recommendations_batch([{"major": "Science"}] * 4, top_n=2)
+    finally:
+        ra.stop_logging()
+    workers = [p for p in tmp_path.iterdir() if p.name != "engine.%d.log" % os.getpid()]
+    assert workers
+    assert all("Cohort worker" in p.read_text(encoding="utf-8") for p in workers)
+
+
+def test_async_service_reranks_each_top_n_separately():
+    import asyncio
+    from recommendation_algorithm import AsyncRecommendationService, DiversityReranker
+
+    engine = CourseRecommendationEngine(reranker=DiversityReranker())
+    student = {"major": "Science", "career_interests": [], "learning_style": "Auditory", "gpa": 2.4}
+    # the reranked top 5 is not the first five of the reranked top 15
+    assert engine.generate_recommendations(student, top_n=15)[:5] != engine.generate_recommendations(student, top_n=5)
+
+    async def scenario():
+        service = AsyncRecommendationService(engine, batch_window=0.05)
+        try:
+            results = await asyncio.gather(service.recommend(student, top_n=15), service.recommend(student, top_n=5),
+                                           service.recommend({"major": "Business"}, top_n=5))
+            return service, results
+        finally:
+            await service.close()
+
+    service, results = asyncio.run(scenario())
+    assert service.batches == 1
+    assert results == [engine.generate_recommendations(student, top_n=15),
+                       engine.generate_recommendations(student, top_n=5),
+                       engine.generate_recommendations({"major": "Business"}, top_n=5)]
+
+
+def test_non_string_career_interests_never_match_but_count():
+    engine = CourseRecommendationEngine()
+    student = {"major": "Technology", "career_interests": ["AI", ["IT"], {"x": 1}]}
+    recs = engine.generate_recommendations(student, top_n=5)
+    assert recs and all(r["factors"]["career"] in (0.0, 0.33, 0.5) for r in recs)
+
+    try:
+        from recommendation_algorithm import VectorizedRecommendationEngine
+        vectorized = VectorizedRecommendationEngine()
+    except ImportError:
+        return
+    assert vectorized.generate_recommendations(student, top_n=5) == recs
+
+
+def test_unreadable_catalog_falls_back_with_a_logged_reason(tmp_path, caplog):
+    path = tmp_path / "courses.json"
+    path.write_text('[{"code": "A1"}, {"code": }]', encoding="utf-8")
+    with caplog.at_level("ERROR", logger="recommendation_algorithm"):
+        engine = CourseRecommendationEngine(catalog_path=path, snapshot_path=tmp_path / "catalog.snapshot")
+    assert len(engine.course_database) == len(CourseRecommendationEngine._builtin_courses())
+    assert "Expecting value" in caplog.text